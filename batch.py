@@ -0,0 +1,205 @@
+"""
+Headless batch evaluation of many transcripts, without the Gradio UI.
+
+Transcripts come from a directory of .txt files (names read from "Candidate Name:" and
+"Interviewer Name:" header lines, or --interviewer) or from a manifest (.jsonl or .csv with
+path, candidate_name, interviewer_name and an optional id column). Each finished evaluation is
+appended to the output as one JSON line. Re-running with the same output skips transcripts that
+already have a successful line, so an interrupted batch can be resumed.
+
+Usage:
+    python batch.py --input-dir ./transcripts --output ./batch_results.jsonl
+    python batch.py --manifest ./manifest.csv --output ./batch_results.jsonl --workers 4 --llm-concurrency 8
+"""
+import os
+import re
+import csv
+import sys
+import json
+import time
+import logging
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import yaml
+from resources import get_registry
+
+logger = logging.getLogger("batch")
+
+CANDIDATE_HEADER = re.compile(r"^\s*Candidate Name:\s*(.+?)\s*$", re.MULTILINE)
+INTERVIEWER_HEADER = re.compile(r"^\s*Interviewer Name:\s*(.+?)\s*$", re.MULTILINE)
+
+# Per worker process state, set by _init_worker
+_registry = None
+_export = False
+
+
+def load_manifest(path):
+    """Read manifest rows from a .jsonl or .csv file."""
+    if path.endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+    else:
+        with open(path, encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+
+    base_dir = os.path.dirname(os.path.abspath(path))
+    items = []
+    for row in rows:
+        transcript_path = row["path"] if os.path.isabs(row["path"]) else os.path.join(base_dir, row["path"])
+        items.append({
+            "id": row.get("id") or row["path"],
+            "path": transcript_path,
+            "candidate_name": row.get("candidate_name", ""),
+            "interviewer_name": row.get("interviewer_name", ""),
+        })
+    return items
+
+
+def scan_directory(input_dir, default_interviewer=""):
+    """One item per .txt file, names come from the transcript header lines."""
+    items = []
+    for file_name in sorted(os.listdir(input_dir)):
+        path = os.path.join(input_dir, file_name)
+        if not file_name.endswith(".txt") or not os.path.isfile(path):
+            continue
+        with open(path, encoding="utf-8") as f:
+            head = f.read(4096)
+        candidate = CANDIDATE_HEADER.search(head)
+        interviewer = INTERVIEWER_HEADER.search(head)
+        items.append({
+            "id": file_name,
+            "path": path,
+            "candidate_name": candidate.group(1) if candidate else "",
+            "interviewer_name": interviewer.group(1) if interviewer else default_interviewer,
+        })
+    return items
+
+
+def completed_ids(output_path):
+    """Ids that already have a successful record in the output file."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # a torn last line from an interrupted run
+            if record.get("status") == "ok":
+                done.add(record["id"])
+    return done
+
+
+def _init_worker(config_path, llm_slots, export, workers):
+    global _registry, _export
+    _registry = get_registry(config_path)
+    # All workers share one semaphore, so LLM calls in flight are bounded across the whole batch
+    _registry.llm.limiter = llm_slots
+    # Per-minute request and token limits are per process, so each worker gets an equal share
+    _registry.llm.rate_limiter = _registry.llm.rate_limiter.split(workers)
+    # The parent has already built or synced the index, workers only load it
+    _registry.config["rag"].update(rebuild_index=False, incremental_index=False)
+    _registry.warm_up()
+    _export = export
+
+
+def evaluate_item(item):
+    # Imported here so the parent process does not need the pipeline dependencies loaded
+    from pipeline import EvalPipeline
+    from preprocessing import Preproc
+    import report_output
+
+    record = dict(item)
+    start = time.perf_counter()
+    try:
+        with open(item["path"], encoding="utf-8") as f:
+            text = f.read().strip()
+        candidate_name = item["candidate_name"].strip()
+        interviewer_name = item["interviewer_name"].strip()
+        if not candidate_name or not interviewer_name:
+            raise ValueError("Candidate and interviewer names are required")
+
+        preproc = Preproc(text, candidate_name, interviewer_name)
+        run_metrics = _registry.metrics.new_run()
+        with run_metrics.span("normalize"):
+            normalized = preproc.normalize()
+        if normalized.candidate_mentions == 0:
+            raise ValueError("Candidate name does not match transcript content")
+        if normalized.interviewer_mentions == 0:
+            raise ValueError("Interviewer name does not match transcript content")
+
+        pipeline = EvalPipeline(text, candidate_name, interviewer_name, registry=_registry, preproc=preproc, metrics=run_metrics)
+        report = pipeline.evaluate_transcript()
+        if _export:
+            export_eng = report_output.Export(report, candidate_name, registry=_registry, metrics=pipeline.metrics)
+            # Only appended to the report store, the JSON files can be generated later with Export.from_store
+            record["request_id"] = export_eng.save()
+        record.update(status="ok", report=report, metrics=pipeline.metrics.to_dict())
+    except Exception as e:
+        logger.exception(f"Batch evaluation failed for {item['id']}")
+        record.update(status="error", error=str(e))
+    record["elapsed_seconds"] = round(time.perf_counter() - start, 3)
+    return record
+
+
+def run_batch(items, output_path, config_path, workers, llm_concurrency, export=False):
+    done = completed_ids(output_path)
+    pending = [item for item in items if item["id"] not in done]
+    logger.info(f"Batch: {len(items)} transcripts, {len(items) - len(pending)} already done, {len(pending)} to evaluate")
+    if not pending:
+        return 0
+
+    if os.path.dirname(output_path):
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+    failures = 0
+    # Stage totals are aggregated here, in the parent, so the metrics file has one writer
+    aggregator = get_registry(config_path).metrics
+    llm_slots = multiprocessing.BoundedSemaphore(llm_concurrency)
+    # Build or sync the RAG index once here, so the workers never embed the corpus or write
+    # the index storage concurrently
+    get_registry(config_path).rag
+    with open(output_path, "a", encoding="utf-8") as out, ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(config_path, llm_slots, export, workers)
+    ) as executor:
+        futures = [executor.submit(evaluate_item, item) for item in pending]
+        for finished, future in enumerate(as_completed(futures), 1):
+            record = future.result()
+            # One line per transcript, flushed right away so a crash loses at most the ones in flight
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            failures += record["status"] != "ok"
+            if "metrics" in record:
+                aggregator.observe(record["metrics"])
+            logger.info(f"Batch: {finished}/{len(pending)} {record['id']} {record['status']} in {record['elapsed_seconds']}s")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--input-dir", help="directory of .txt transcripts")
+    source.add_argument("--manifest", help=".jsonl or .csv manifest with path, candidate_name, interviewer_name")
+    parser.add_argument("--output", required=True, help="JSONL file the results are appended to")
+    parser.add_argument("--config", default="./config/config.yaml")
+    parser.add_argument("--interviewer", default="", help="interviewer name for transcripts without a header")
+    parser.add_argument("--workers", type=int, help="worker processes (default: batch.workers)")
+    parser.add_argument("--llm-concurrency", type=int, help="LLM calls in flight across all workers (default: batch.llm_concurrency)")
+    parser.add_argument("--export", action="store_true", help="also append each report to the report store")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    with open(args.config) as f:
+        batch_config = yaml.safe_load(f).get("batch") or {}
+    workers = args.workers or batch_config.get("workers", 4)
+    llm_concurrency = args.llm_concurrency or batch_config.get("llm_concurrency", 8)
+
+    items = load_manifest(args.manifest) if args.manifest else scan_directory(args.input_dir, args.interviewer)
+    failures = run_batch(items, args.output, args.config, workers, llm_concurrency, export=args.export)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""
+Compare the RAG embedding backends (rag.embed_backend) on the transcript nodes the index is built from.
+
+Every backend embeds the same nodes from rag.data_dir in batches and the same queries one at a
+time. Reports load time, index build throughput (nodes/s), query latency p50/p95 and, against the
+first backend, the mean and minimum cosine similarity of text and query embeddings. Exits with 1
+when a backend's mean cosine falls below --min-cosine, so it can gate a backend switch.
+
+Usage:
+    python benchmarks/embedding_benchmark.py --backends huggingface,onnx,int8
+    python benchmarks/embedding_benchmark.py --backends huggingface,int8 --batch-size 64 --threads 4 --nodes 256
+"""
+import os
+import sys
+import math
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yaml
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+QUERIES = [
+    "Candidate explains how they designed a scalable microservice architecture",
+    "Interviewer asks about handling conflicts within the team",
+    "Experience with Python testing frameworks and continuous integration",
+    "Candidate struggles to explain database indexing",
+    "Leadership of a migration project under a tight deadline",
+]
+
+
+def percentile(values, q):
+    """Nearest-rank percentile, q in 0-100."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(q / 100 * len(ordered))) - 1]
+
+
+def load_node_texts(data_dir, limit):
+    """Node texts as the RAG index splits the transcripts, repeated up to limit when there are fewer."""
+    from llama_index.core import SimpleDirectoryReader, Settings
+
+    documents = SimpleDirectoryReader(input_dir=data_dir).load_data()
+    texts = [node.get_content() for node in Settings.node_parser.get_nodes_from_documents(documents)]
+    if not texts:
+        raise SystemExit(f"No transcript text found in {data_dir}")
+    return (texts * math.ceil(limit / len(texts)))[:limit]
+
+
+def bench_backend(rag_config, backend, texts, queries):
+    from embedding_backends import create_embed_model
+
+    start = time.perf_counter()
+    model = create_embed_model({**rag_config, "embed_backend": backend})
+    load_seconds = time.perf_counter() - start
+
+    # One untimed pass, so lazy initialization and first-call allocation are not measured
+    model.get_text_embedding_batch(texts[:rag_config["embed_batch_size"]])
+
+    start = time.perf_counter()
+    model.get_text_embedding_batch(texts)
+    build_seconds = time.perf_counter() - start
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        model.get_query_embedding(query)
+        latencies.append(time.perf_counter() - start)
+
+    return model, {
+        "load_seconds": round(load_seconds, 2),
+        "nodes_per_second": round(len(texts) / build_seconds, 1),
+        "query_p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "query_p95_ms": round(percentile(latencies, 95) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", default=os.path.join(REPO_DIR, "config", "config.yaml"))
+    parser.add_argument("--backends", default="huggingface,onnx,int8", help="comma separated, the first one is the reference")
+    parser.add_argument("--nodes", type=int, default=128, help="transcript nodes embedded per backend")
+    parser.add_argument("--queries", type=int, default=50, help="single query embeddings timed per backend")
+    parser.add_argument("--batch-size", type=int, help="overrides rag.embed_batch_size")
+    parser.add_argument("--threads", type=int, help="overrides rag.embed_threads")
+    parser.add_argument("--min-cosine", type=float, default=0.99, help="lowest acceptable mean cosine against the reference")
+    args = parser.parse_args()
+
+    with open(args.config) as f:
+        rag_config = yaml.safe_load(f)["rag"]
+    rag_config.setdefault("embed_batch_size", 10)
+    if args.batch_size:
+        rag_config["embed_batch_size"] = args.batch_size
+    if args.threads is not None:
+        rag_config["embed_threads"] = args.threads
+
+    data_dir = os.path.join(REPO_DIR, rag_config["data_dir"])
+    texts = load_node_texts(data_dir, args.nodes)
+    queries = (QUERIES * math.ceil(args.queries / len(QUERIES)))[:args.queries]
+    backends = args.backends.split(",")
+
+    print(f"{len(texts)} nodes, {len(queries)} queries, batch size {rag_config['embed_batch_size']}, "
+          f"threads {rag_config.get('embed_threads') or 'default'}, model {rag_config['embed_model']}")
+    from embedding_backends import cosine_agreement
+
+    reference = None
+    failed = False
+    for backend in backends:
+        model, result = bench_backend(rag_config, backend, texts, queries)
+        if reference is None:
+            reference = model
+        else:
+            text_mean, text_min = cosine_agreement(reference, model, texts)
+            query_mean, query_min = cosine_agreement(reference, model, QUERIES, query=True)
+            result["text_cosine"] = f"{text_mean:.4f} (min {text_min:.4f})"
+            result["query_cosine"] = f"{query_mean:.4f} (min {query_min:.4f})"
+            failed |= min(text_mean, query_mean) < args.min_cosine
+        print(f"{backend:<12}" + "  ".join(f"{name}={value}" for name, value in result.items()))
+
+    if failed:
+        print(f"Mean cosine below {args.min_cosine} for at least one backend")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,277 @@
+"""
+Offline end-to-end benchmark of Preproc and EvalPipeline against a local stub LLM server.
+
+Transcripts of varying length are generated from data/synthetic_transcripts, the LLM base_url is
+pointed at benchmarks/stub_llm_server.py and the RAG index is built into a temporary directory.
+Reports per-stage (from the pipeline metrics spans) and end-to-end p50/p95 latency, throughput,
+LLM calls, tokens and peak memory. Report files are not exported.
+
+Usage:
+    python benchmarks/pipeline_benchmark.py --mock-embeddings
+    python benchmarks/pipeline_benchmark.py --transcripts 16 --lengths 0.5,1,2,4 --concurrency 4 \\
+        --latency-ms 500 --error-rate 0.02 --low-confidence-rate 0.5 --json bench_results.json
+"""
+import os
+import sys
+import math
+import json
+import time
+import argparse
+import tempfile
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yaml
+from stub_llm_server import StubLLMServer
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_interviews(path):
+    """Split the synthetic transcripts file into (header lines, turn paragraphs, candidate name) per interview."""
+    with open(path, encoding="utf-8") as f:
+        blocks = f.read().split("Candidate Name:")[1:]
+    interviews = []
+    for block in blocks:
+        paragraphs = [p.strip() for p in ("Candidate Name:" + block).split("\n\n") if p.strip()]
+        header = paragraphs[0]
+        candidate = header.splitlines()[0].split(":", 1)[1].strip()
+        interviews.append((header, paragraphs[1:], candidate))
+    return interviews
+
+
+def generate_transcripts(interviews, count, lengths):
+    """
+    count transcripts cycling through the length factors. A factor scales the number of
+    question/answer paragraphs of the base interview, borrowing paragraphs from the next
+    interviews when it is above 1.
+    """
+    all_paragraphs = [p for _, paragraphs, _ in interviews for p in paragraphs]
+    offsets, total = [], 0
+    for _, paragraphs, _ in interviews:
+        offsets.append(total)
+        total += len(paragraphs)
+
+    transcripts = []
+    for i in range(count):
+        base = i % len(interviews)
+        header, paragraphs, candidate = interviews[base]
+        factor = lengths[i % len(lengths)]
+        n = max(1, round(len(paragraphs) * factor))
+        body = [all_paragraphs[(offsets[base] + k) % total] for k in range(n)]
+        transcripts.append({
+            "id": f"{i:03d}_{candidate.replace(' ', '_')}_x{factor}",
+            "factor": factor,
+            "candidate_name": candidate,
+            "text": "\n\n".join([header] + body),
+        })
+    return transcripts
+
+
+def percentile(values, q):
+    """Nearest-rank percentile, q in 0-100."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(q / 100 * len(ordered))) - 1]
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def write_config(args, base_url, work_dir):
+    """
+    Copy of the app config pointed at the stub server, with the RAG storage, response cache and
+    report store in the temporary work dir, so stub answers never reach the live ones.
+    """
+    with open(args.config) as f:
+        config = yaml.safe_load(f)
+    config["llm"]["base_url"] = base_url
+    config["llm"].setdefault("cache", {}).update(enabled=args.cache, path=os.path.join(work_dir, "llm_cache.sqlite"))
+    config["pipeline"]["concurrent_evaluation"] = args.max_in_flight > 1
+    config["pipeline"]["max_in_flight"] = args.max_in_flight
+    config["pipeline"]["speculative_rag"] = {"enabled": args.speculative_rag, "prefetch_summary": args.prefetch_summary}
+    if args.evaluation_mode:
+        config["pipeline"]["evaluation_mode"] = args.evaluation_mode
+    config["rag"]["data_dir"] = os.path.join(REPO_DIR, "data", "synthetic_transcripts")
+    config["rag"]["storage_dir"] = os.path.join(work_dir, "rag_storage")
+    config["rag"]["rebuild_index"] = True
+    if args.mock_embeddings:
+        config["rag"]["embed_model"] = "mock"
+    config.setdefault("reports", {})["store_dir"] = os.path.join(work_dir, "report_store")
+    config.setdefault("metrics", {})["enabled"] = False
+
+    config_path = os.path.join(work_dir, "config.yaml")
+    with open(config_path, "w") as f:
+        yaml.safe_dump(config, f)
+    return config_path
+
+
+def run_one(transcript, interviewer, registry):
+    from pipeline import EvalPipeline
+    from preprocessing import Preproc
+
+    result = {"id": transcript["id"], "factor": transcript["factor"], "chars": len(transcript["text"])}
+    start = time.perf_counter()
+    try:
+        preproc = Preproc(transcript["text"], transcript["candidate_name"], interviewer)
+        run_metrics = registry.metrics.new_run()
+        with run_metrics.span("normalize"):
+            normalized = preproc.normalize()
+        if normalized.candidate_mentions == 0 or normalized.interviewer_mentions == 0:
+            raise ValueError("Candidate or interviewer name does not match transcript content")
+
+        pipeline = EvalPipeline(transcript["text"], transcript["candidate_name"], interviewer,
+                                registry=registry, preproc=preproc, metrics=run_metrics)
+        report = pipeline.evaluate_transcript()
+        result.update(status="ok", metrics=pipeline.metrics.to_dict(),
+                      rag_used=sum(r.get("rag_used") == "YES" for r in report.values()))
+    except Exception as e:
+        result.update(status="error", error=str(e))
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def summarize(results, wall_seconds, warm_up_seconds, stub):
+    ok = [r for r in results if r["status"] == "ok"]
+    stage_seconds = defaultdict(list)
+    stage_totals = defaultdict(lambda: defaultdict(int))
+    for r in ok:
+        for span in r["metrics"]["spans"]:
+            stage_seconds[span["stage"]].append(span["seconds"])
+            for name in ("llm_calls", "cache_hits", "prompt_tokens", "completion_tokens"):
+                stage_totals[span["stage"]][name] += span[name]
+
+    counters = defaultdict(int)
+    for r in ok:
+        for name, amount in r["metrics"].get("counters", {}).items():
+            counters[name] += amount
+
+    end_to_end = [r["seconds"] for r in ok]
+    by_factor = defaultdict(list)
+    for r in ok:
+        by_factor[r["factor"]].append(r["seconds"])
+
+    return {
+        "transcripts": len(results),
+        "succeeded": len(ok),
+        "failed": len(results) - len(ok),
+        "warm_up_seconds": round(warm_up_seconds, 3),
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_per_minute": round(len(ok) / wall_seconds * 60, 2) if wall_seconds else 0.0,
+        "end_to_end": {"p50": round(percentile(end_to_end, 50), 3), "p95": round(percentile(end_to_end, 95), 3)},
+        "end_to_end_by_length": {
+            str(factor): {"count": len(v), "p50": round(percentile(v, 50), 3), "p95": round(percentile(v, 95), 3)}
+            for factor, v in sorted(by_factor.items())
+        },
+        "stages": {
+            stage: {
+                "count": len(v),
+                "p50": round(percentile(v, 50), 4),
+                "p95": round(percentile(v, 95), 4),
+                "total": round(sum(v), 3),
+                **stage_totals.get(stage, {}),
+            }
+            for stage, v in stage_seconds.items()
+        },
+        "rag_refinements": sum(r["rag_used"] for r in ok),
+        "counters": dict(counters),
+        "stub_requests": stub.requests,
+        "stub_errors": stub.errors,
+        "peak_rss_mb": round(peak_rss_mb(), 1) if resource is not None else None,
+        "errors": sorted({r["error"] for r in results if r["status"] != "ok"}),
+    }
+
+
+def print_summary(summary):
+    print(f"Transcripts: {summary['succeeded']}/{summary['transcripts']} ok, "
+          f"warm-up {summary['warm_up_seconds']}s, wall {summary['wall_seconds']}s, "
+          f"{summary['throughput_per_minute']} transcripts/min")
+    print(f"End to end: p50 {summary['end_to_end']['p50']}s  p95 {summary['end_to_end']['p95']}s")
+    for factor, stats in summary["end_to_end_by_length"].items():
+        print(f"  length x{factor:<5} n={stats['count']:<3} p50 {stats['p50']}s  p95 {stats['p95']}s")
+    print(f"{'stage':<16}{'count':>7}{'p50 s':>10}{'p95 s':>10}{'total s':>10}{'calls':>7}{'hits':>6}{'prompt tok':>12}{'compl tok':>11}")
+    for stage, stats in summary["stages"].items():
+        print(f"{stage:<16}{stats['count']:>7}{stats['p50']:>10.4f}{stats['p95']:>10.4f}{stats['total']:>10.3f}"
+              f"{stats.get('llm_calls', 0):>7}{stats.get('cache_hits', 0):>6}"
+              f"{stats.get('prompt_tokens', 0):>12}{stats.get('completion_tokens', 0):>11}")
+    print(f"RAG refinements: {summary['rag_refinements']}, stub requests: {summary['stub_requests']} "
+          f"({summary['stub_errors']} failed on purpose)")
+    for name, amount in sorted(summary["counters"].items()):
+        print(f"  {name}: {amount}")
+    if summary["peak_rss_mb"] is not None:
+        print(f"Peak RSS: {summary['peak_rss_mb']} MB")
+    for error in summary["errors"]:
+        print(f"  error: {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", default=os.path.join(REPO_DIR, "config", "config.yaml"))
+    parser.add_argument("--transcripts-file", default=os.path.join(REPO_DIR, "data", "synthetic_transcripts", "interview_transcripts.txt"))
+    parser.add_argument("--transcripts", type=int, default=8, help="number of generated transcripts")
+    parser.add_argument("--lengths", default="0.5,1,2,4", help="comma separated length factors, cycled over the transcripts")
+    parser.add_argument("--interviewer", default="Interviewer")
+    parser.add_argument("--concurrency", type=int, default=1, help="transcripts evaluated at the same time")
+    parser.add_argument("--max-in-flight", type=int, default=4, help="pipeline.max_in_flight, 1 runs criteria sequentially")
+    parser.add_argument("--evaluation-mode", choices=["per_criterion", "batched"])
+    parser.add_argument("--cache", action="store_true", help="keep the LLM response cache enabled")
+    parser.add_argument("--speculative-rag", action="store_true", help="prefetch similar cases during the first pass")
+    parser.add_argument("--prefetch-summary", action="store_true", help="with --speculative-rag, also prefetch the case summary")
+    parser.add_argument("--mock-embeddings", action="store_true", help="use constant embeddings instead of the HuggingFace model")
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--jitter-ms", type=float, default=100)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--low-confidence-rate", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the summary to this file")
+    args = parser.parse_args()
+
+    # The client only needs some key, the stub does not check it
+    os.environ.setdefault("OPENAI_API_KEY_HTEC", "stub")
+    lengths = [float(x) for x in args.lengths.split(",")]
+    transcripts = generate_transcripts(load_interviews(args.transcripts_file), args.transcripts, lengths)
+
+    with StubLLMServer(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+                       error_status=args.error_status, low_confidence_rate=args.low_confidence_rate,
+                       seed=args.seed) as stub, tempfile.TemporaryDirectory() as work_dir:
+        from resources import get_registry
+
+        config_path = write_config(args, stub.base_url, work_dir)
+        registry = get_registry(config_path, os.path.join(REPO_DIR, "config", "template.json"))
+        warm_up_start = time.perf_counter()
+        registry.warm_up()
+        from preprocessing import get_spelling_corrector
+        get_spelling_corrector()  # dictionary load is a one-off per process, keep it out of the timings
+        warm_up_seconds = time.perf_counter() - warm_up_start
+
+        print(f"Evaluating {len(transcripts)} transcripts against {stub.base_url} "
+              f"(concurrency {args.concurrency}, max in flight {args.max_in_flight})")
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            results = list(executor.map(lambda t: run_one(t, args.interviewer, registry), transcripts))
+        wall_seconds = time.perf_counter() - start
+        summary = summarize(results, wall_seconds, warm_up_seconds, stub)
+
+    print_summary(summary)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "summary": summary}, f, indent=2)
+    return 0 if not summary["failed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""
+Benchmark Preproc.correct_spelling against the original per-call SpellChecker implementation
+and check that both produce the same output.
+
+Usage: python benchmarks/spelling_benchmark.py [transcript.txt] [--repeat N]
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from spellchecker import SpellChecker
+from preprocessing import Preproc, get_spelling_corrector
+
+
+# Original implementation, kept here as the reference output
+def legacy_correct_spelling(text):
+    spell = SpellChecker(language="en")
+    words = text.split()
+    corrected_words = []
+    for word in words:
+        if word.lower() in spell:
+            corrected_words.append(word)
+        else:
+            corrected = spell.correction(word)
+            corrected_words.append(corrected if corrected else word)
+    return ' '.join(corrected_words)
+
+
+def timed(fn, text, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        output = fn(text)
+    return output, (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("transcript", nargs="?", default="./data/synthetic_transcripts/interview_transcripts.txt")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--candidate", default="Jamie Petrov")
+    parser.add_argument("--interviewer", default="Interviewer")
+    args = parser.parse_args()
+
+    with open(args.transcript, encoding="utf-8") as f:
+        raw = f.read()
+
+    # Spelling runs per speaker turn, so compare on the turn texts of the normalized transcript
+    preproc = Preproc(raw, args.candidate, args.interviewer)
+    text = ' '.join(turn.text for turn in preproc.normalize().turns)
+    print(f"Transcript: {len(text.split())} tokens, {len(set(text.split()))} unique")
+
+    legacy, legacy_time = timed(legacy_correct_spelling, text, args.repeat)
+    get_spelling_corrector()  # dictionary load is a one-off per process, keep it out of the timing
+    current, current_time = timed(preproc.correct_spelling, text, args.repeat)
+
+    print(f"legacy  correct_spelling: {legacy_time:.3f}s per call")
+    print(f"current correct_spelling: {current_time:.3f}s per call ({legacy_time / max(current_time, 1e-9):.1f}x)")
+
+    # Only tokens skipped as non-words (numbers, speaker tags) are expected to differ
+    diffs = [(a, b) for a, b in zip(legacy.split(), current.split()) if a != b]
+    print(f"Differing tokens: {len(diffs)}")
+    for a, b in sorted(set(diffs))[:20]:
+        print(f"  legacy={a!r} current={b!r}")
+    return 0 if not diffs else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
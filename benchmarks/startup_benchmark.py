@@ -0,0 +1,63 @@
+"""
+Measure the import time of the app modules in a fresh interpreter with python -X importtime,
+and list the packages that cost the most. Run it before and after a change to imports.
+
+Usage: python benchmarks/startup_benchmark.py [--modules main_deps] [--top 15] [--repeat 3]
+"""
+import os
+import re
+import sys
+import argparse
+import subprocess
+from collections import defaultdict
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Everything main.py imports before it builds the UI, without launching it
+MODULE_SETS = {
+    "main_deps": ["gradio", "log_utils", "pipeline", "preprocessing", "report_output", "resources"],
+    "app": ["log_utils", "pipeline", "preprocessing", "report_output", "resources"],
+    "batch": ["batch"],
+}
+
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$")
+
+
+def measure(modules):
+    """Per top-level package cumulative import time in microseconds and the total, from one fresh interpreter."""
+    code = "; ".join(f"import {module}" for module in modules)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=REPO_DIR, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "import failed")
+
+    packages = defaultdict(int)
+    for line in proc.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        # Only the outermost imports, their cumulative time already holds everything below them
+        if match and len(match.group(3)) == 1:
+            packages[match.group(4).split(".")[0]] += int(match.group(2))
+    return packages, sum(packages.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", default="main_deps", help=f"one of {', '.join(MODULE_SETS)} or a comma separated list")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--repeat", type=int, default=3, help="fresh interpreters, the fastest run is reported")
+    args = parser.parse_args()
+
+    modules = MODULE_SETS.get(args.modules) or args.modules.split(",")
+    runs = [measure(modules) for _ in range(args.repeat)]
+    packages, total = min(runs, key=lambda run: run[1])
+
+    print(f"Importing {', '.join(modules)}: {total / 1e6:.3f}s (best of {args.repeat})")
+    for name, micros in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {name:<28}{micros / 1e6:>8.3f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
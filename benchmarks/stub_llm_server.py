@@ -0,0 +1,172 @@
+"""
+Local OpenAI-compatible chat completions stub for offline benchmarks.
+
+Answers POST .../chat/completions with canned JSON shaped like the pipeline expects: first-pass and
+batched evaluations (a share of them low-confidence, so the RAG refinement path runs), refinements
+and similar-case summaries. Latency, jitter and the share of failing requests are configurable, and
+every response carries a usage block with token counts estimated at four characters per token.
+
+Usage: python benchmarks/stub_llm_server.py [--port 8765] [--latency-ms 300] [--error-rate 0.05]
+Then point llm.base_url at http://127.0.0.1:8765/v1/
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The same estimate the pipeline uses for excerpt budgets and rate limits
+from excerpts import estimate_tokens
+
+BATCHED_CRITERION = re.compile(r'^\s*"([^"]+)":', re.MULTILINE)
+
+
+class StubLLMServer:
+    """
+    Threaded HTTP server answering chat completions with canned responses.
+    Randomness is seeded so two runs with the same settings see the same responses.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency_ms=300, jitter_ms=100, error_rate=0.0,
+                 error_status=500, low_confidence_rate=0.3, seed=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.low_confidence_rate = low_confidence_rate
+        self.requests = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread = None
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1/"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="stub-llm", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _draw(self):
+        """Delay, failure and low-confidence draws for one request, taken under the lock."""
+        with self._lock:
+            self.requests += 1
+            delay = max(0.0, self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+            failed = self._random.random() < self.error_rate
+            self.errors += failed
+            low = self._random.random() < self.low_confidence_rate
+            confidence = self._random.randint(30, 60) if low else self._random.randint(75, 95)
+            return delay, failed, confidence
+
+    def respond(self, prompt, confidence):
+        """Canned completion text for one of the pipeline's prompts."""
+        if prompt.lstrip().startswith("Summarize"):
+            return "Similar past candidates gave structured answers with measurable outcomes and clear trade-offs."
+        evaluation = {
+            "confidence": confidence,
+            "rationale": "The candidate gives concrete examples and explains the reasoning behind decisions.",
+            "supporting_excerpts": "I communicate trade-offs explicitly so stakeholders can make informed choices.",
+        }
+        if "refine and improve" in prompt:
+            return json.dumps({**evaluation, "confidence": max(confidence, 80)})
+        if "Criteria:" in prompt:
+            criteria_block = prompt.split("Criteria:", 1)[1].split("Format the output", 1)[0]
+            return json.dumps({crit: evaluation for crit in BATCHED_CRITERION.findall(criteria_block)})
+        return json.dumps(evaluation)
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if not self.path.rstrip("/").endswith("chat/completions"):
+                    return self._send(404, {"error": {"message": f"Unknown path {self.path}", "type": "not_found"}})
+
+                delay, failed, confidence = server._draw()
+                time.sleep(delay)
+                if failed:
+                    return self._send(server.error_status, {"error": {"message": "Stub failure", "type": "server_error"}})
+
+                prompt = "\n".join(m.get("content") or "" for m in body.get("messages", []) if m.get("role") == "user")
+                content = server.respond(prompt, confidence)
+                prompt_tokens = sum(estimate_tokens(m.get("content") or "") for m in body.get("messages", []))
+                completion_tokens = estimate_tokens(content)
+                self._send(200, {
+                    "id": f"chatcmpl-stub-{server.requests}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "stub"),
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": completion_tokens,
+                        "total_tokens": prompt_tokens + completion_tokens,
+                    },
+                })
+
+            def _send(self, status, payload):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass  # keep benchmark output readable
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--jitter-ms", type=float, default=100)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--low-confidence-rate", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = StubLLMServer(args.host, args.port, args.latency_ms, args.jitter_ms, args.error_rate,
+                           args.error_status, args.low_confidence_rate, args.seed)
+    print(f"Stub LLM server listening on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
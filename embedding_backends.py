@@ -0,0 +1,165 @@
+"""
+Embedding backends for the RAG module, selected with rag.embed_backend.
+
+huggingface  HuggingFaceEmbedding through full PyTorch (default)
+onnx         the same model exported once to ONNX (cached under rag.embed_cache_dir) and run by ONNX Runtime
+int8         the same model in PyTorch with int8 dynamic quantization of its Linear layers
+
+The onnx and int8 backends tokenize and embed each batch of rag.embed_batch_size texts in one
+forward pass on rag.embed_threads threads, with the pooling, normalization and query instruction
+HuggingFaceEmbedding uses, so their vectors can be compared with (and searched against) the ones
+already in the index. Check that with cosine_agreement() or benchmarks/embedding_benchmark.py
+before switching a deployment.
+"""
+import os
+import logging
+from typing import List, Optional
+
+from llama_index.core.embeddings import BaseEmbedding
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+
+logger = logging.getLogger("embedding_backends")
+
+BACKENDS = ("huggingface", "onnx", "int8")
+
+
+class CPUEmbedding(BaseEmbedding):
+    """Sentence embeddings from a HuggingFace encoder run by an optimized CPU runtime."""
+
+    backend: str = Field(default="onnx", description="onnx or int8")
+    max_length: int = Field(default=512)
+    pooling: str = Field(default="cls", description="cls or mean")
+    normalize: bool = Field(default=True)
+    query_instruction: Optional[str] = Field(default=None)
+    text_instruction: Optional[str] = Field(default=None)
+
+    _tokenizer = PrivateAttr()
+    _model = PrivateAttr()
+
+    def __init__(self, model_name, backend="onnx", threads=0, cache_dir="./data/embed_models", **kwargs):
+        from transformers import AutoTokenizer
+        from llama_index.embeddings.huggingface.utils import (
+            get_query_instruct_for_model_name,
+            get_text_instruct_for_model_name,
+        )
+
+        kwargs.setdefault("query_instruction", get_query_instruct_for_model_name(model_name))
+        kwargs.setdefault("text_instruction", get_text_instruct_for_model_name(model_name))
+        super().__init__(model_name=model_name, backend=backend, **kwargs)
+
+        self._tokenizer = AutoTokenizer.from_pretrained(model_name)
+        if backend == "onnx":
+            self._model = _load_onnx_model(model_name, threads, cache_dir)
+        elif backend == "int8":
+            self._model = _load_int8_model(model_name, threads)
+        else:
+            raise ValueError(f"Unknown CPU embedding backend: {backend}")
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CPUEmbedding"
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        import torch
+
+        inputs = self._tokenizer(texts, padding=True, truncation=True, max_length=self.max_length, return_tensors="pt")
+        with torch.inference_mode():
+            hidden = self._model(**inputs).last_hidden_state
+        if self.pooling == "mean":
+            mask = inputs["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+            pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+        else:
+            pooled = hidden[:, 0]
+        if self.normalize:
+            pooled = torch.nn.functional.normalize(pooled, p=2, dim=1)
+        return pooled.tolist()
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._embed([_with_instruction(self.query_instruction, query)])[0]
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        # Called by get_text_embedding_batch with up to embed_batch_size texts, embedded in one forward pass
+        return self._embed([_with_instruction(self.text_instruction, text) for text in texts])
+
+
+def _with_instruction(instruction, text):
+    return f"{instruction} {text}".strip() if instruction else text
+
+
+def _load_onnx_model(model_name, threads, cache_dir):
+    try:
+        import onnxruntime
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+    except ImportError as e:
+        raise ImportError("rag.embed_backend: onnx needs the optimum[onnxruntime] package") from e
+
+    options = onnxruntime.SessionOptions()
+    if threads:
+        options.intra_op_num_threads = threads
+    # Exported once, later starts load the ONNX graph from the cache directory
+    export_dir = os.path.join(cache_dir, model_name.replace("/", "--") + "-onnx")
+    if os.path.exists(os.path.join(export_dir, "model.onnx")):
+        return ORTModelForFeatureExtraction.from_pretrained(export_dir, session_options=options)
+    logger.info(f"Exporting embedding model {model_name} to ONNX in {export_dir}")
+    model = ORTModelForFeatureExtraction.from_pretrained(model_name, export=True, session_options=options)
+    model.save_pretrained(export_dir)
+    return model
+
+
+def _load_int8_model(model_name, threads):
+    import torch
+    from transformers import AutoModel
+
+    if threads:
+        # Process-wide, it applies to every PyTorch model in this process
+        torch.set_num_threads(threads)
+    model = AutoModel.from_pretrained(model_name).eval()
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def create_embed_model(rag_config):
+    """The embedding model configured under rag, e.g. for RAGModule or the resource registry."""
+    model_name = rag_config.get("embed_model")
+    backend = rag_config.get("embed_backend", "huggingface")
+    batch_size = rag_config.get("embed_batch_size", 10)
+    if model_name == "mock":
+        # Constant vectors, no download, for offline runs and benchmarks
+        from llama_index.core.embeddings import MockEmbedding
+
+        return MockEmbedding(embed_dim=rag_config.get("mock_embed_dim", 384))
+    if backend == "huggingface":
+        from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+
+        return HuggingFaceEmbedding(model_name=model_name, embed_batch_size=batch_size)
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown rag.embed_backend {backend!r}, expected one of {', '.join(BACKENDS)}")
+    return CPUEmbedding(
+        model_name,
+        backend=backend,
+        threads=rag_config.get("embed_threads", 0),
+        cache_dir=rag_config.get("embed_cache_dir", "./data/embed_models"),
+        embed_batch_size=batch_size,
+    )
+
+
+def cosine_agreement(reference, candidate, texts, query=False):
+    """
+    Cosine similarity between the embeddings two models give the same texts, as (mean, min).
+    Vectors from a backend with a mean close to 1 can be searched against an index built by the other.
+    """
+    import numpy as np
+
+    if query:
+        a = np.asarray([reference.get_query_embedding(text) for text in texts], dtype=np.float32)
+        b = np.asarray([candidate.get_query_embedding(text) for text in texts], dtype=np.float32)
+    else:
+        a = np.asarray(reference.get_text_embedding_batch(texts), dtype=np.float32)
+        b = np.asarray(candidate.get_text_embedding_batch(texts), dtype=np.float32)
+    cosines = (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+    return float(cosines.mean()), float(cosines.min())
@@ -0,0 +1,149 @@
+import re
+import math
+import logging
+from collections import Counter
+
+logger = logging.getLogger("excerpts")
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9']+")
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+STOPWORDS = frozenset(
+    "a an and are as at be by did do does for from has have how i in is it its of on or "
+    "so that the their this to was we well what with you your".split()
+)
+
+
+def estimate_tokens(text):
+    """Rough LLM token count, about four characters per token for English."""
+    return max(1, round(len(text) / 4))
+
+
+def _terms(text):
+    # Truncating to six characters is a cheap stemmer: communicate/communication -> commun
+    return [word[:6] for word in TOKEN_PATTERN.findall(text.lower()) if word not in STOPWORDS]
+
+
+class ExcerptSelector:
+    """
+    Splits speaker turns into chunks, scores them against a criterion with BM25
+    and packs the best ones into a token budget.
+    """
+
+    def __init__(self, turns, token_budget=1500, chunk_tokens=150, interviewer_weight=0.5, k1=1.5, b=0.75):
+        self.token_budget = token_budget
+        # The candidate is being evaluated, so their own words rank above the interviewer's questions
+        self.interviewer_weight = interviewer_weight
+        self.k1 = k1
+        self.b = b
+        self.chunks = self._chunk(turns, chunk_tokens)
+
+        self.term_counts = [Counter(_terms(chunk["text"])) for chunk in self.chunks]
+        self.lengths = [sum(counts.values()) for counts in self.term_counts]
+        self.avg_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+        document_frequency = Counter(term for counts in self.term_counts for term in counts)
+        n = len(self.chunks)
+        self.idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in document_frequency.items()}
+
+    @staticmethod
+    def _chunk(turns, chunk_tokens):
+        """
+        One chunk per turn, long turns are split on sentence boundaries into chunks of about chunk_tokens.
+        Sentences longer than chunk_tokens, e.g. unpunctuated speech-to-text, are split on word boundaries.
+        """
+        chunks = []
+        for turn_index, turn in enumerate(turns):
+            current = []
+            for sentence in ExcerptSelector._sentences(turn.text, chunk_tokens):
+                if current and estimate_tokens(" ".join(current + [sentence])) > chunk_tokens:
+                    chunks.append({"turn": turn_index, "speaker": turn.speaker, "text": " ".join(current)})
+                    current = []
+                current.append(sentence)
+            if current:
+                chunks.append({"turn": turn_index, "speaker": turn.speaker, "text": " ".join(current)})
+
+        for chunk_index, chunk in enumerate(chunks):
+            chunk["chunk"] = chunk_index
+            chunk["tokens"] = estimate_tokens(chunk["text"])
+        return chunks
+
+    @staticmethod
+    def _sentences(text, chunk_tokens):
+        for sentence in SENTENCE_END.split(text):
+            if estimate_tokens(sentence) <= chunk_tokens:
+                yield sentence
+                continue
+            words = []
+            for word in sentence.split():
+                if words and estimate_tokens(" ".join(words + [word])) > chunk_tokens:
+                    yield " ".join(words)
+                    words = []
+                words.append(word)
+            if words:
+                yield " ".join(words)
+
+    def score(self, query):
+        query_terms = set(_terms(query))
+        scores = []
+        for chunk, counts, length in zip(self.chunks, self.term_counts, self.lengths):
+            score = 0.0
+            for term in query_terms:
+                tf = counts.get(term)
+                if tf:
+                    norm = self.k1 * (1 - self.b + self.b * length / (self.avg_length or 1))
+                    score += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            if chunk["speaker"] == "Interviewer":
+                score *= self.interviewer_weight
+            scores.append(score)
+        return scores
+
+    def select(self, query, token_budget=None):
+        """
+        Return the best scoring chunks that fit in the token budget, in transcript order.
+        Chunks without matching terms only fill budget left over by the relevant ones.
+        The selection always holds some candidate text when the transcript has any.
+        """
+        budget = token_budget or self.token_budget
+        scores = self.score(query)
+        ranked = sorted(range(len(self.chunks)), key=lambda i: (-scores[i], i))
+
+        selected = []
+        used = 0
+        for i in ranked:
+            if used + self.chunks[i]["tokens"] <= budget:
+                selected.append(i)
+                used += self.chunks[i]["tokens"]
+
+        chunks = [dict(self.chunks[i], score=round(scores[i], 3)) for i in selected]
+        if not any(self._is_candidate(chunk) for chunk in chunks):
+            chunks = self._with_candidate_text(chunks, ranked, scores, budget)
+        return sorted(chunks, key=lambda chunk: chunk["chunk"])
+
+    @staticmethod
+    def _is_candidate(chunk):
+        return chunk["speaker"] != "Interviewer"
+
+    def _with_candidate_text(self, chunks, ranked, scores, budget):
+        """Make room for the best candidate chunk by dropping the lowest ranked selected chunks."""
+        best = next((i for i in ranked if self._is_candidate(self.chunks[i])), None)
+        if best is None:
+            return chunks
+        candidate = dict(self.chunks[best], score=round(scores[best], 3))
+        if candidate["tokens"] > budget:
+            logger.warning(f"Candidate excerpt of {candidate['tokens']} tokens truncated to the {budget} token budget")
+            candidate.update(text=candidate["text"][:budget * 4], tokens=budget)
+        # chunks are in rank order, so the least relevant ones go first
+        while chunks and sum(chunk["tokens"] for chunk in chunks) + candidate["tokens"] > budget:
+            chunks.pop()
+        return chunks + [candidate]
+
+    @staticmethod
+    def render(chunks):
+        """Excerpt text for a prompt, gaps between non-adjacent chunks are marked with [...]."""
+        lines = []
+        previous = None
+        for chunk in chunks:
+            if previous is not None and chunk["chunk"] != previous + 1:
+                lines.append("[...]")
+            lines.append(f"{chunk['speaker']}: {chunk['text']}" if chunk["speaker"] else chunk["text"])
+            previous = chunk["chunk"]
+        return "\n".join(lines)
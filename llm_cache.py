@@ -0,0 +1,112 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import logging
+
+logger = logging.getLogger("llm_cache")
+
+
+class ResponseCache:
+    """
+    On-disk cache of LLM responses stored in SQLite.
+    Entries older than max_age_hours are dropped and the least recently used entries
+    are evicted once the cache holds more than max_entries.
+    The cache is best-effort: a failed lookup is a miss and a failed store is skipped, so a
+    locked, full or read-only database never fails the LLM call it caches.
+    """
+
+    def __init__(self, path, max_entries=5000, max_age_hours=168):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_hours * 3600 if max_age_hours else None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Batch and serving workers share one file: WAL lets readers run alongside a writer and
+        # the busy timeout makes writers wait for each other instead of failing
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model, temperature, max_tokens, system_prompt, prompt):
+        """Hash of everything that determines the response."""
+        payload = json.dumps([model, temperature, max_tokens, system_prompt, prompt], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            try:
+                return self._get(key, now)
+            except sqlite3.Error as e:
+                self._rollback()
+                self.misses += 1
+                logger.warning(f"LLM cache lookup failed, continuing uncached: {e}")
+                return None
+
+    def _get(self, key, now):
+        row = self._conn.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is not None and self.max_age_seconds and now - row[1] > self.max_age_seconds:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._conn.commit()
+            row = None
+        if row is None:
+            self.misses += 1
+            return None
+        self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+        self._conn.commit()
+        self.hits += 1
+        return row[0]
+
+    def put(self, key, response):
+        now = time.time()
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, response, created, accessed) VALUES (?, ?, ?, ?)",
+                    (key, response, now, now),
+                )
+                self._evict(now)
+                self._conn.commit()
+            except sqlite3.Error as e:
+                self._rollback()
+                logger.warning(f"LLM cache store failed, response not cached: {e}")
+
+    def _rollback(self):
+        try:
+            self._conn.rollback()
+        except sqlite3.Error:
+            pass
+
+    def _evict(self, now):
+        if self.max_age_seconds:
+            self._conn.execute("DELETE FROM responses WHERE created < ?", (now - self.max_age_seconds,))
+        if self.max_entries:
+            count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
@@ -1,34 +1,215 @@
-import openai
 import json
+import time
+import random
+import sqlite3
+import asyncio
 import logging
 import os
+import threading
+import weakref
+from contextlib import nullcontext
+from llm_cache import ResponseCache
+from excerpts import estimate_tokens
+from rate_limit import RateLimiter
+import metrics
 
 logger = logging.getLogger("llm_client")
 
+# Status codes worth another attempt: rate limits, timeouts and gateway/server errors
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+def is_retryable(error):
+    """Rate limits, timeouts, dropped connections and gateway/server errors are worth another attempt."""
+    import openai
+
+    retryable_errors = (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError)
+    return isinstance(error, retryable_errors) or getattr(error, "status_code", None) in RETRYABLE_STATUS
+
+
 class LLMClient:
+    """
+    Chat completions client with its own pooled HTTP connections, sync run() and async arun(),
+    per-minute request and token limits and retries with jittered exponential backoff.
+    """
+
     def __init__(self, config: dict):
-        openai.api_key = os.getenv("OPENAI_API_KEY_HTEC")
-        openai.base_url = config.get("base_url")
+        self.api_key = os.getenv("OPENAI_API_KEY_HTEC")
+        self.base_url = config.get("base_url")
         self.model = config.get("model", "gpt-4")
         self.temperature = config.get("temperature", 0.0)
         self.max_tokens = config.get("max_tokens", 1000)
+        self.system_prompt = "You are a professional Talent Acquisition interviewer"
+        # Optional semaphore-like context manager bounding the calls in flight, e.g. shared by batch workers
+        self.limiter = None
+
+        # Connection pool and retry settings, the OpenAI SDK's own retries are off so ours are the only ones
+        self.timeout = config.get("timeout_seconds", 60)
+        self.pool_size = config.get("pool_size", 16)
+        self.max_retries = config.get("max_retries", 4)
+        self.backoff_base = config.get("backoff_base_seconds", 1.0)
+        self.backoff_max = config.get("backoff_max_seconds", 30.0)
+        self.rate_limiter = RateLimiter(config.get("requests_per_minute"), config.get("tokens_per_minute"))
+        self._client = None
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._client_lock = threading.Lock()
+
+        # Optional on-disk response cache, bypass skips lookups but still stores fresh responses
+        cache_config = config.get("cache") or {}
+        self.cache = None
+        self.cache_bypass = cache_config.get("bypass", False)
+        if cache_config.get("enabled", False):
+            try:
+                self.cache = ResponseCache(
+                    cache_config.get("path", "./data/llm_cache.sqlite"),
+                    max_entries=cache_config.get("max_entries", 5000),
+                    max_age_hours=cache_config.get("max_age_hours", 168),
+                )
+            except (sqlite3.Error, OSError) as e:
+                # The cache is best-effort, LLM calls go uncached when it cannot be opened
+                logger.warning(f"LLM cache unavailable, continuing uncached: {e}")
+
+    @property
+    def client(self):
+        # Created on first use, so a missing API key fails the call and not the app start,
+        # and the openai and httpx packages are only imported then
+        with self._client_lock:
+            if self._client is None:
+                import openai
+                import httpx
+
+                self._client = openai.OpenAI(
+                    api_key=self.api_key, base_url=self.base_url, timeout=self.timeout, max_retries=0,
+                    http_client=httpx.Client(limits=self._pool_limits(), timeout=self.timeout),
+                )
+            return self._client
+
+    @property
+    def async_client(self):
+        # httpx async connections belong to one event loop, so there is one client per loop
+        loop = asyncio.get_running_loop()
+        with self._client_lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                import openai
+                import httpx
+
+                client = self._async_clients[loop] = openai.AsyncOpenAI(
+                    api_key=self.api_key, base_url=self.base_url, timeout=self.timeout, max_retries=0,
+                    http_client=httpx.AsyncClient(limits=self._pool_limits(), timeout=self.timeout),
+                )
+            return client
+
+    def _pool_limits(self):
+        import httpx
+
+        return httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
 
-    def run(self, prompt: str):
+    def run(self, prompt: str, use_cache: bool = True):
+        cache_key, cached = self._cached(prompt, use_cache)
+        if cached is not None:
+            return cached
+
+        estimated = self._estimate(prompt)
+        for attempt in range(self.max_retries + 1):
+            time.sleep(self.rate_limiter.reserve(estimated))
+            try:
+                with self.limiter or nullcontext():
+                    resp = self.client.chat.completions.create(**self._request(prompt))
+                break
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+            time.sleep(delay)
+
+        return self._finish(resp, cache_key, estimated)
+
+    async def arun(self, prompt: str, use_cache: bool = True):
+        cache_key, cached = self._cached(prompt, use_cache)
+        if cached is not None:
+            return cached
+
+        estimated = self._estimate(prompt)
+        for attempt in range(self.max_retries + 1):
+            await asyncio.sleep(self.rate_limiter.reserve(estimated))
+            try:
+                if self.limiter is not None:
+                    # The shared limiter may be a process semaphore, so it is acquired off the event loop
+                    await asyncio.to_thread(self.limiter.acquire)
+                try:
+                    resp = await self.async_client.chat.completions.create(**self._request(prompt))
+                finally:
+                    if self.limiter is not None:
+                        self.limiter.release()
+                break
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+            await asyncio.sleep(delay)
+
+        return self._finish(resp, cache_key, estimated)
+
+    def _cached(self, prompt, use_cache):
+        if self.cache is None:
+            return None, None
+        cache_key = ResponseCache.make_key(self.model, self.temperature, self.max_tokens, self.system_prompt, prompt)
+        if use_cache and not self.cache_bypass:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                logger.info("LLM response served from cache")
+                metrics.record_llm_call(cached=True)
+                return cache_key, cached
+        return cache_key, None
+
+    def _request(self, prompt):
+        return dict(
+            model=self.model,
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+            messages=[
+                {"role":"system","content":self.system_prompt},
+                {"role":"user","content":prompt}
+            ],
+        )
+
+    def _estimate(self, prompt):
+        # Prompt tokens only, the completion is charged once its real size is known
+        return estimate_tokens(self.system_prompt) + estimate_tokens(prompt)
+
+    def _retry_delay(self, error, attempt):
+        """Seconds to wait before the next attempt, raises when the error is final or attempts are used up."""
+        if not is_retryable(error) or attempt >= self.max_retries:
+            logger.error(f"LLM call failed after {attempt + 1} attempt(s): {error}")
+            raise ValueError("LLM evaluation failed. LLM is not accessible.") from error
+
+        # Full jitter backoff, but never sooner than the gateway's Retry-After
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                delay = max(delay, min(self.backoff_max, float(retry_after)))
+            except ValueError:
+                pass
+        logger.warning(f"LLM call failed ({error.__class__.__name__}), retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+        return delay
+
+    def _finish(self, resp, cache_key, estimated):
         try:
-            resp = openai.chat.completions.create(
-                model=self.model,
-                temperature=self.temperature,
-                max_tokens=self.max_tokens,
-                messages=[
-                    {"role":"system","content":"You are a professional Talent Acquisition interviewer"},
-                    {"role":"user","content":prompt}
-                ],
-            )
             text = resp.choices[0].message.content
-            return text
-        except Exception as e:
-            logger.error(f"LLM call failed: {e}")
-            raise ValueError("LLM evaluation failed. LLM is not accessible.")
+        except (AttributeError, IndexError) as e:
+            logger.error(f"LLM response has no content: {e}")
+            raise ValueError("LLM evaluation failed. LLM is not accessible.") from e
+        usage = getattr(resp, "usage", None)
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+
+        # Correct the token bucket with what the call really used
+        self.rate_limiter.settle(estimated, prompt_tokens + completion_tokens)
+        # Token counts go to the instrumentation span of the calling stage, if any
+        metrics.record_llm_call(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+        if cache_key is not None and text:
+            self.cache.put(cache_key, text)
+        return text
 
 def safe_parse_json(text: str):
     """Attempt to parse LLM output as JSON"""
@@ -36,4 +217,4 @@ def safe_parse_json(text: str):
         return json.loads(text)
     except json.JSONDecodeError:
         print("Failed to parse LLM output")
-        return {}
\ No newline at end of file
+        return {}
@@ -1,18 +1,148 @@
-from datetime import datetime
-logs = []
-
-def log(message):
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    tmessage=f"{timestamp} {message}"
-    logs.append(tmessage)
-
-def print_logs():
-    print("\n--- LOG OUTPUT ---")
-    for entry in logs:
-        print(entry)
-
-def save_logs_to_file(filename):
-    """Save all logged messages to a file."""
-    with open(filename, "w") as file:
-        for entry in logs:
-            file.write(entry + "\n")
+"""
+Request-scoped log capture.
+
+Each request runs inside request_context(), which makes a bounded RequestLog current for that
+request's context (and for the worker threads it hands the context to). RequestLogHandler, added
+to the root logger by install(), copies every record emitted in that context into the request's
+ring buffer, so modules only call their own logger and the message is formatted once.
+save_logs_to_file() hands a snapshot of the buffer to a background writer thread and returns.
+"""
+import os
+import queue
+import atexit
+import logging
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger("log_utils")
+
+DEFAULT_MAX_ENTRIES = 2000
+LOG_FORMAT = "%(asctime)s %(message)s"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_current = contextvars.ContextVar("request_log", default=None)
+
+
+class RequestLog:
+    """Ring buffer of the formatted log lines of one request, oldest lines are dropped first."""
+
+    def __init__(self, name, max_entries=DEFAULT_MAX_ENTRIES):
+        self.name = name
+        self.entries = deque(maxlen=max_entries)
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def append(self, line):
+        with self._lock:
+            if len(self.entries) == self.entries.maxlen:
+                self.dropped += 1
+            self.entries.append(line)
+
+    def snapshot(self):
+        with self._lock:
+            lines = list(self.entries)
+            if self.dropped:
+                lines.insert(0, f"... {self.dropped} earlier log lines dropped")
+            return lines
+
+
+class RequestLogHandler(logging.Handler):
+    """Send records to the RequestLog of the current context, records outside a request are ignored."""
+
+    def emit(self, record):
+        request_log = _current.get()
+        if request_log is None:
+            return
+        try:
+            request_log.append(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+
+_handler = None
+_handler_lock = threading.Lock()
+
+
+def install(level=logging.INFO):
+    """Add the request log handler to the root logger once, and let records of the given level through."""
+    global _handler
+    with _handler_lock:
+        if _handler is None:
+            _handler = RequestLogHandler()
+            _handler.setFormatter(logging.Formatter(LOG_FORMAT, DATE_FORMAT))
+            logging.getLogger().addHandler(_handler)
+        root = logging.getLogger()
+        if root.getEffectiveLevel() > level:
+            root.setLevel(level)
+    return _handler
+
+
+@contextmanager
+def request_context(name, max_entries=DEFAULT_MAX_ENTRIES):
+    """
+    Make a new RequestLog current for the duration of the block. Thread pools started inside it
+    must run their work in contextvars.copy_context() so their records land in the same log.
+    """
+    request_log = RequestLog(name, max_entries)
+    token = _current.set(request_log)
+    try:
+        yield request_log
+    finally:
+        _current.reset(token)
+
+
+def current_request():
+    """The RequestLog of the current context, or None outside a request."""
+    return _current.get()
+
+
+class _LogWriter:
+    """Single daemon thread writing log files from a bounded queue."""
+
+    def __init__(self, max_pending=64):
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, filename, lines):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                self._thread.start()
+        # Blocks when the writer is behind, so pending snapshots never pile up in memory
+        self._queue.put((filename, lines))
+
+    def flush(self):
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            filename, lines = self._queue.get()
+            try:
+                if os.path.dirname(filename):
+                    os.makedirs(os.path.dirname(filename), exist_ok=True)
+                with open(filename, "w", encoding="utf-8") as file:
+                    file.write("".join(line + "\n" for line in lines))
+            except Exception as e:
+                logger.error(f"Failed saving logs to {filename}: {e}")
+            finally:
+                self._queue.task_done()
+
+
+_writer = _LogWriter()
+atexit.register(_writer.flush)
+
+
+def save_logs_to_file(filename, request_log=None):
+    """Queue the messages of one request (the current one by default) to be written to a file."""
+    request_log = request_log or _current.get()
+    if request_log is None:
+        raise RuntimeError("save_logs_to_file called outside a request_context")
+    _writer.submit(filename, request_log.snapshot())
+
+
+def flush():
+    """Wait until every queued log file has been written."""
+    _writer.flush()
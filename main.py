@@ -1,16 +1,93 @@
-import re
+import time
+# Startup phases are measured from here, the first thing the process does
+STARTED = time.perf_counter()
+
 import gradio as gr
 import json
 import log_utils
 from pipeline import EvalPipeline
+from preprocessing import Preproc
 import report_output
-from datetime import datetime
+from resources import get_registry
+from serving import WorkerPool
 import os
+import queue
 import logging
+import threading
 
+logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("main")
+registry = get_registry()
+log_utils.install()
+first_request_done = threading.Event()
+serving_config = registry.config.get("serving") or {}
+# Set when serving.workers > 1, requests then run in forked worker processes instead of threads
+worker_pool = None
+
+def mark_startup(phase):
+    """Log and publish the seconds from process start until a startup phase was reached."""
+    seconds = time.perf_counter() - STARTED
+    logger.info(f"Startup: {phase} after {seconds:.3f}s")
+    registry.metrics.record_startup(phase, seconds)
+
+mark_startup("imports")
 
 def process_transcript(transcript_text, candidate_name, interviewer_name):
+    """
+    Generator of (json_output, report_url, full_report_url) updates. With ui.stream_results on,
+    each criterion is pushed as soon as it is evaluated, the last update carries the report links.
+    """
+    stream = (registry.config.get("ui") or {}).get("stream_results", False)
+    criteria = registry.config["pipeline"]["criteria_list"]
+    events = queue.Queue()
+    args = (transcript_text, candidate_name, interviewer_name)
+    if worker_pool is not None:
+        worker_pool.submit(events, *args)
+    else:
+        # The request runs in its own thread, so its log and metrics context stays in one thread
+        # however Gradio schedules the steps of this generator
+        emit = lambda kind, payload: events.put((kind, payload))
+        threading.Thread(target=run_request, args=(emit, *args), daemon=True).start()
+
+    results = {}
+    while True:
+        try:
+            kind, payload = events.get(timeout=serving_config.get("request_timeout_seconds", 900))
+        except queue.Empty:
+            logger.error(f"No result for {candidate_name} within the request timeout")
+            yield "Evaluation Failed: timed out waiting for the evaluation", None, None
+            return
+        if kind == "metrics":
+            # Aggregated here, so the metrics file has one writer however many workers there are
+            registry.metrics.observe(payload)
+            continue
+        if kind == "done":
+            if not first_request_done.is_set():
+                first_request_done.set()
+                mark_startup("first_request")
+            yield payload
+            return
+        if stream:
+            crit, result = payload
+            results[crit] = result
+            partial = {"progress": f"{len(results)}/{len(criteria)} criteria evaluated"}
+            partial.update((c, results[c]) for c in criteria if c in results)
+            yield json.dumps(partial, indent=2), None, None
+
+def run_request(emit, transcript_text, candidate_name, interviewer_name):
+    """Evaluate one request, reporting criterion results, metrics and the final outcome through emit(kind, payload)."""
+    try:
+        # Each request logs into its own bounded buffer, so concurrent requests never mix their lines
+        max_entries = (registry.config.get("logging") or {}).get("max_entries_per_request", log_utils.DEFAULT_MAX_ENTRIES)
+        with log_utils.request_context(candidate_name, max_entries):
+            outcome = evaluate_request(transcript_text, candidate_name, interviewer_name, emit)
+    except Exception as e:
+        logger.exception(f"Unexpected error in run_request: {e}")
+        outcome = f"Critical Error: {str(e)}", None, None
+    # Always sent, so process_transcript never waits forever
+    emit("done", outcome)
+
+def evaluate_request(transcript_text, candidate_name, interviewer_name, emit):
     try:
         # Validate Inputs
         if candidate_name.strip() == "":
@@ -22,47 +99,48 @@ def process_transcript(transcript_text, candidate_name, interviewer_name):
 
         text = transcript_text.strip()
 
-        # Validate presence of names inside transcript
-        matches_can = re.findall(rf'\b{re.escape(candidate_name)}\b', text)
-        matches_int = re.findall(rf'\b{re.escape(interviewer_name)}\b', text)
+        # Validate presence of names inside transcript, counted by the same pass that anonymizes it
+        preproc = Preproc(text, candidate_name.strip(), interviewer_name.strip())
+        run_metrics = registry.metrics.new_run()
+        with run_metrics.span("normalize"):
+            normalized = preproc.normalize()
 
-        if len(matches_can) == 0:
+        if normalized.candidate_mentions == 0:
             return "Candidate name does not match transcript content", None, None
-        if len(matches_int) == 0:
+        if normalized.interviewer_mentions == 0:
             return "Interviewer name does not match transcript content", None, None
 
-        log = f"Evaluation started for Candidate: {candidate_name}"
-        logger.info(log), log_utils.log(log)
+        logger.info(f"Evaluation started for Candidate: {candidate_name}")
 
         # ---- Run Pipeline ----
         try:
-            pipeline = EvalPipeline(text, candidate_name, interviewer_name)
-            report = pipeline.evaluate_transcript()
+            pipeline = EvalPipeline(text, candidate_name, interviewer_name, registry=registry, preproc=preproc, metrics=run_metrics)
+            report = pipeline.evaluate_transcript(on_result=lambda crit, result: emit("criterion", (crit, result)))
 
         except Exception as e:
-            logger.exception("Pipeline execution failed")
-            log_utils.log(f"Pipeline Error: {e}")
+            logger.exception(f"Pipeline execution failed: {e}")
             return f"Evaluation Failed: {str(e)}", None, None
 
-        log = "Successful Evaluation for all criteria"
-        logger.info(log), log_utils.log(log)
+        logger.info("Successful Evaluation for all criteria")
 
         # ---- Export Reports ----
         try:
-            export_eng = report_output.Export(report, candidate_name)
+            export_eng = report_output.Export(report, candidate_name, registry=registry, metrics=pipeline.metrics)
             report_url = export_eng.json_report()
             full_report_url = export_eng.full_report()
-            log = "Reports successfully exported"
-            logger.info(log), log_utils.log(log)
+            logger.info(f"Reports successfully exported, request ID {export_eng.request_id}")
         except Exception as e:
-            logger.exception("Report export failed")
-            log_utils.log(f"Report Export Error: {e}")
+            logger.exception(f"Report export failed: {e}")
             return f"Evaluation succeeded but report export failed: {e}", None, None
 
+        # ---- Record Metrics ----
+        emit("metrics", pipeline.metrics.to_dict())
+
         # ---- Save Logs ----
+        # Only this request's lines are written, by the background log writer
         try:
-            timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-            log_utils.save_logs_to_file(f"./logs/{candidate_name}_req_ID_{timestamp}.log")
+            # Named with the unique request ID, like the report files
+            log_utils.save_logs_to_file(f"./logs/{candidate_name}_req_ID_{export_eng.request_id}.log")
         except Exception as e:
             logger.error(f"Failed saving logs: {e}")
 
@@ -70,8 +148,7 @@ def process_transcript(transcript_text, candidate_name, interviewer_name):
 
     except Exception as e:
         # Catch any unexpected crash
-        logger.exception("Unexpected error in process_transcript")
-        log_utils.log(f"Unexpected Error: {e}")
+        logger.exception(f"Unexpected error in process_transcript: {e}")
         return f"Critical Error: {str(e)}", None, None
 
 # Wrapper to handle file or text input
@@ -83,11 +160,29 @@ def handle_input(file_input, transcript_text, candidate_name, interviewer_name):
                 with open(file_input, "r", encoding="utf-8") as f:
                     transcript_text = f.read()
             else:
-                return "Invalid file input", None, None
+                yield "Invalid file input", None, None
+                return
         except Exception as e:
-            return f"Error reading file: {e}", None, None
+            yield f"Error reading file: {e}", None, None
+            return
+
+    yield from process_transcript(transcript_text, candidate_name, interviewer_name)
 
-    return process_transcript(transcript_text, candidate_name, interviewer_name)
+# Reload configuration, template, LLM client and RAG index after config changes
+def reload_resources():
+    global worker_pool
+    try:
+        registry.reload()
+        registry.warm_up(connections=worker_pool is None)
+        if worker_pool is not None:
+            # Workers hold a copy of the old resources, new ones are forked from the reloaded parent
+            # and the old ones exit after finishing the requests they already took
+            old_pool, worker_pool = worker_pool, start_workers()
+            old_pool.shutdown()
+        return "Configuration reloaded"
+    except Exception as e:
+        logger.exception("Reloading resources failed")
+        return f"Reload Failed: {e}"
 
 # Gradio UI
 with gr.Blocks(title="Candidate Evaluation Report Generator") as demo:
@@ -101,7 +196,9 @@ with gr.Blocks(title="Candidate Evaluation Report Generator") as demo:
 
     transcript_text = gr.Textbox(label="Or Paste Transcript Text", lines=8, placeholder="Paste transcript text here...")
 
-    generate_btn = gr.Button("Generate JSON Report")
+    with gr.Row():
+        generate_btn = gr.Button("Generate JSON Report")
+        reload_btn = gr.Button("Reload Configuration")
 
     json_output = gr.Code(label="Generated JSON", language="json")
     download_btn_rep = gr.File(label="Download JSON Report")
@@ -112,5 +209,47 @@ with gr.Blocks(title="Candidate Evaluation Report Generator") as demo:
         inputs=[file_input, transcript_text, candidate_name, interviewer_name],
         outputs=[json_output, download_btn_rep, download_btn_full_rep]
     )
-
-demo.launch()
\ No newline at end of file
+    reload_btn.click(reload_resources, inputs=[], outputs=[json_output])
+
+def init_worker(workers):
+    registry.after_fork()
+    # Per-minute request and token limits are per process, so each worker gets an equal share
+    registry.llm.rate_limiter = registry.llm.rate_limiter.split(workers)
+
+def start_workers():
+    workers = serving_config.get("workers", 0)
+    return WorkerPool(
+        run_request,
+        workers=workers,
+        concurrency=serving_config.get("concurrency_per_worker", 2),
+        initializer=init_worker,
+        initargs=(workers,),
+    ).start()
+
+def warm_up_in_background():
+    # Requests arriving earlier wait only for the resources they need that are still loading
+    try:
+        registry.warm_up()
+        mark_startup("warm_up")
+    except Exception:
+        logger.exception("Background warm-up failed, resources will load on first use")
+
+workers = serving_config.get("workers", 0)
+if workers > 1:
+    # Load the models and index once and fork the workers from them, so they share those pages.
+    # The LLM client and report store are opened in each worker instead
+    registry.warm_up(connections=False)
+    mark_startup("warm_up")
+    worker_pool = start_workers()
+
+# Generator handlers stream their updates through the queue, requests beyond queue_depth are turned away
+queue_options = {"max_size": serving_config.get("queue_depth")}
+if worker_pool is not None:
+    queue_options["default_concurrency_limit"] = workers * serving_config.get("concurrency_per_worker", 2)
+demo.queue(**queue_options)
+# Serve the UI first, then load config, LLM client, spelling dictionary, embedding model and RAG index
+demo.launch(prevent_thread_lock=True)
+mark_startup("ui_ready")
+if worker_pool is None:
+    threading.Thread(target=warm_up_in_background, name="warm-up", daemon=True).start()
+demo.block_thread()
\ No newline at end of file
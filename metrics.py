@@ -0,0 +1,211 @@
+"""
+Stage-level instrumentation for evaluation runs.
+
+RunMetrics.span() times one stage (optionally for one criterion) and makes the span current
+for its context, so LLMClient.run can add the prompt and completion tokens from the OpenAI
+response usage, or a cache hit, to it via record_llm_call(). RunMetrics.count() keeps named
+event counters, e.g. RAG prefetch hits and waste. MetricsAggregator keeps the
+process-wide totals of finished runs and writes them in the Prometheus text format, for a
+local scraper (e.g. the node exporter textfile collector) to pick up.
+"""
+import os
+import time
+import threading
+import contextvars
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger("metrics")
+
+_current_span = contextvars.ContextVar("metrics_span", default=None)
+
+SPAN_COUNTERS = ("llm_calls", "cache_hits", "prompt_tokens", "completion_tokens")
+
+
+class Span:
+    """Wall time and LLM usage of one stage."""
+
+    def __init__(self, stage, criterion=None):
+        self.stage = stage
+        self.criterion = criterion
+        self.seconds = 0.0
+        self.llm_calls = 0
+        self.cache_hits = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def to_dict(self):
+        return {
+            "stage": self.stage,
+            "criterion": self.criterion,
+            "seconds": round(self.seconds, 4),
+            **{name: getattr(self, name) for name in SPAN_COUNTERS},
+        }
+
+
+def record_llm_call(prompt_tokens=0, completion_tokens=0, cached=False):
+    """Add one LLM call to the span of the current context, if there is one."""
+    span = _current_span.get()
+    if span is None:
+        return
+    span.llm_calls += 1
+    span.cache_hits += bool(cached)
+    span.prompt_tokens += prompt_tokens or 0
+    span.completion_tokens += completion_tokens or 0
+
+
+class RunMetrics:
+    """Spans of one evaluation run, in the order they finished, and named event counters."""
+
+    def __init__(self, prompt_cost_per_1k=0.0, completion_cost_per_1k=0.0):
+        self.prompt_cost_per_1k = prompt_cost_per_1k
+        self.completion_cost_per_1k = completion_cost_per_1k
+        self.spans = []
+        self.counters = {}
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def span(self, stage, criterion=None):
+        span = Span(stage, criterion)
+        token = _current_span.set(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        finally:
+            span.seconds = time.perf_counter() - start
+            _current_span.reset(token)
+            with self._lock:
+                self.spans.append(span)
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def cost(self, prompt_tokens, completion_tokens):
+        return (prompt_tokens * self.prompt_cost_per_1k + completion_tokens * self.completion_cost_per_1k) / 1000
+
+    def to_dict(self):
+        """Spans plus per-stage and whole-run totals, as stored under "metrics" in the full report."""
+        with self._lock:
+            spans = [span.to_dict() for span in self.spans]
+            counters = dict(self.counters)
+
+        stages = {}
+        for span in spans:
+            totals = stages.setdefault(span["stage"], {"count": 0, "seconds": 0.0, **dict.fromkeys(SPAN_COUNTERS, 0)})
+            totals["count"] += 1
+            totals["seconds"] = round(totals["seconds"] + span["seconds"], 4)
+            for name in SPAN_COUNTERS:
+                totals[name] += span[name]
+
+        prompt_tokens = sum(span["prompt_tokens"] for span in spans)
+        completion_tokens = sum(span["completion_tokens"] for span in spans)
+        return {
+            "wall_seconds": round(time.perf_counter() - self._start, 4),
+            "llm_calls": sum(span["llm_calls"] for span in spans),
+            "cache_hits": sum(span["cache_hits"] for span in spans),
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "estimated_cost": round(self.cost(prompt_tokens, completion_tokens), 6),
+            "counters": counters,
+            "stages": stages,
+            "spans": spans,
+        }
+
+
+class MetricsAggregator:
+    """
+    Process-wide totals of finished runs per stage and criterion, rewritten to a
+    Prometheus text file after every observed run when a path is configured.
+    """
+
+    def __init__(self, config=None):
+        config = config or {}
+        self.path = config.get("path") if config.get("enabled", False) else None
+        self.prompt_cost_per_1k = config.get("prompt_cost_per_1k", 0.0)
+        self.completion_cost_per_1k = config.get("completion_cost_per_1k", 0.0)
+        self.runs = 0
+        self.run_seconds = 0.0
+        self.last_run_seconds = 0.0
+        self.estimated_cost = 0.0
+        self.totals = {}
+        self.counters = {}
+        # Seconds from process start to each startup phase, e.g. imports, ui_ready, first_request
+        self.startup = {}
+        self._lock = threading.Lock()
+
+    def new_run(self):
+        return RunMetrics(self.prompt_cost_per_1k, self.completion_cost_per_1k)
+
+    def observe(self, run):
+        """Add a finished run, given as RunMetrics.to_dict(), and rewrite the metrics file."""
+        with self._lock:
+            self.runs += 1
+            self.run_seconds += run["wall_seconds"]
+            self.last_run_seconds = run["wall_seconds"]
+            self.estimated_cost += run["estimated_cost"]
+            for name, amount in run.get("counters", {}).items():
+                self.counters[name] = self.counters.get(name, 0) + amount
+            for span in run["spans"]:
+                key = (span["stage"], span["criterion"] or "")
+                totals = self.totals.setdefault(key, {"count": 0, "seconds": 0.0, **dict.fromkeys(SPAN_COUNTERS, 0)})
+                totals["count"] += 1
+                totals["seconds"] += span["seconds"]
+                for name in SPAN_COUNTERS:
+                    totals[name] += span[name]
+            if self.path:
+                self._write()
+
+    def record_startup(self, phase, seconds):
+        """Record when a startup phase was reached and rewrite the metrics file."""
+        with self._lock:
+            self.startup[phase] = seconds
+            if self.path:
+                self._write()
+
+    def render(self):
+        lines = [
+            "# HELP evaluator_runs_total Finished evaluation runs.",
+            "# TYPE evaluator_runs_total counter",
+            f"evaluator_runs_total {self.runs}",
+            "# HELP evaluator_run_seconds_total Wall time of finished evaluation runs.",
+            "# TYPE evaluator_run_seconds_total counter",
+            f"evaluator_run_seconds_total {self.run_seconds:.4f}",
+            "# HELP evaluator_last_run_seconds Wall time of the last finished evaluation run.",
+            "# TYPE evaluator_last_run_seconds gauge",
+            f"evaluator_last_run_seconds {self.last_run_seconds:.4f}",
+            "# HELP evaluator_estimated_cost_total Estimated LLM cost from the configured token prices.",
+            "# TYPE evaluator_estimated_cost_total counter",
+            f"evaluator_estimated_cost_total {self.estimated_cost:.6f}",
+        ]
+        if self.startup:
+            lines += ["# HELP evaluator_startup_seconds Seconds from process start until a startup phase was reached.",
+                      "# TYPE evaluator_startup_seconds gauge"]
+            lines += [f'evaluator_startup_seconds{{phase="{phase}"}} {seconds:.4f}' for phase, seconds in self.startup.items()]
+        for name, amount in sorted(self.counters.items()):
+            lines += [f"# TYPE evaluator_{name}_total counter", f"evaluator_{name}_total {amount}"]
+        series = (("spans", "count", "Finished stage spans."),
+                  ("stage_seconds", "seconds", "Wall time spent in a stage."),
+                  ("llm_calls", "llm_calls", "LLM calls made in a stage, cached ones included."),
+                  ("cache_hits", "cache_hits", "LLM calls served from the response cache."),
+                  ("prompt_tokens", "prompt_tokens", "Prompt tokens reported by the LLM."),
+                  ("completion_tokens", "completion_tokens", "Completion tokens reported by the LLM."))
+        for name, field, help_text in series:
+            lines += [f"# HELP evaluator_{name}_total {help_text}", f"# TYPE evaluator_{name}_total counter"]
+            for (stage, criterion), totals in sorted(self.totals.items()):
+                value = f"{totals[field]:.4f}" if field == "seconds" else totals[field]
+                lines.append(f'evaluator_{name}_total{{stage="{stage}",criterion="{criterion}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def _write(self):
+        # Written to a temporary file and renamed, so a scraper never reads a half written file
+        try:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(self.render())
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"Failed writing metrics to {self.path}: {e}")
@@ -1,35 +1,79 @@
 import logging
-import json
-import yaml
-import log_utils
-from rag_module import RAGModule
-from llm_client import LLMClient, safe_parse_json
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, Future, as_completed
+from llm_client import safe_parse_json
+from resources import get_registry
 from preprocessing import Preproc
+from excerpts import ExcerptSelector
 
 logger = logging.getLogger("EvalPipeline")
 
+NO_SIMILAR_CASES = "No similar past cases available."
+
 
 class EvalPipeline:
-    def __init__(self, transcript_text, candidate_name, interviewer_name, config_path="./config/config.yaml"):
-        # Open configuration file and fetch values for llm, rag, criteria
-        with open(config_path) as f:
-            self.config = yaml.safe_load(f)
-        self.llm = LLMClient(self.config["llm"])
-        self.rag = RAGModule(self.config["rag"])
+    def __init__(self, transcript_text, candidate_name, interviewer_name, config_path="./config/config.yaml", registry=None, preproc=None, metrics=None):
+        # Fetch the shared configuration and llm from the process-wide registry. The RAG index is only
+        # fetched when similar cases are needed, so a run with no low-confidence criterion never waits
+        # for a warm-up still building it
+        self.registry = registry or get_registry(config_path)
+        self.config = self.registry.config
+        self.llm = self.registry.llm
         self.criteria = self.config["pipeline"]["criteria_list"]
         self.confidence_threshold = self.config["pipeline"]["confidence_threshold"]
+        self.concurrent = self.config["pipeline"].get("concurrent_evaluation", False)
+        self.max_in_flight = self.config["pipeline"].get("max_in_flight", 4)
+        self.evaluation_mode = self.config["pipeline"].get("evaluation_mode", "per_criterion")
+        # Optional similar-case retrieval (and summary) started alongside the first-pass LLM calls
+        speculative_config = self.config["pipeline"].get("speculative_rag") or {}
+        self.speculative_rag = speculative_config.get("enabled", False)
+        self.prefetch_summary = speculative_config.get("prefetch_summary", False)
+
+        # Stage timings and LLM token usage of this run, attached to the full report under "metrics".
+        # Callers that normalize the transcript before the pipeline exists pass theirs in, with
+        # that pass already timed as the normalize stage
+        preproc = preproc or Preproc(transcript_text, candidate_name, interviewer_name)
+        if metrics is None:
+            metrics = self.registry.metrics.new_run()
+            with metrics.span("normalize"):
+                preproc.normalize()
+        self.metrics = metrics
+
+        # Preprocess the transcript text and store it, with its speaker turns, in variables.
+        # It is normalized already, so this is the spelling correction
+        with self.metrics.span("spellcheck"):
+            self.preproc_text = preproc.preprocess_transcript()
+        self.turns = preproc.turns
+
+        # JSON template to extract question and description for a category, and categories
+        self.tjson = self.registry.template
 
-        # Preprocess the transcript text and store it in a variable
-        self.preproc_text = Preproc(transcript_text, candidate_name, interviewer_name).preprocess_transcript()
+        # Per-run memo for work that is identical across criteria (similar cases, their summary)
+        self._memo = {}
+        self._memo_lock = threading.Lock()
+        # Set once every criterion is finished, a prefetch that has not started the case summary by then skips it
+        self._criteria_done = False
+        self._summary_prefetched = False
+        self._prefetch_lock = threading.Lock()
 
-        # Read the JSON template to extract question and description for a category, and categories
-        with open("./config/template.json") as t:
-            self.tjson = json.load(t)
+        # Optional token-budgeted excerpt selection, otherwise every prompt gets the whole transcript
+        excerpt_config = self.config["pipeline"].get("excerpt_selection") or {}
+        self.excerpt_selector = None
+        self.rag_query_text = self.preproc_text
+        if excerpt_config.get("enabled", False):
+            self.excerpt_selector = ExcerptSelector(
+                self.turns,
+                token_budget=excerpt_config.get("token_budget", 1500),
+                chunk_tokens=excerpt_config.get("chunk_tokens", 150),
+            )
+            self.batched_token_budget = excerpt_config.get("batched_token_budget", 4000)
+            # RAG retrieval uses one transcript-level excerpt so it stays the same for every criterion
+            self.rag_query_text = ExcerptSelector.render(self.excerpt_selector.select(self._all_criteria_query()))
 
     # Evaluation for a single category
     def evaluate_category(self, crit, input_text):
-        log = f"Extract category question and description for {crit} criteria"
-        logger.info(log), log_utils.log(log)
+        logger.info(f"Extract category question and description for {crit} criteria")
 
         # Extract question and description for a category from the JSON template
         category_question = self.tjson[crit]["question"]
@@ -45,9 +89,9 @@ class EvalPipeline:
             """
 
         # Response from the LLM
-        llm_response = self.llm.run(base_prompt)
-        log = f"Successful LLM response for {crit} criteria"
-        logger.info(log), log_utils.log(log)
+        with self.metrics.span("llm_initial", crit):
+            llm_response = self.llm.run(base_prompt)
+        logger.info(f"Successful LLM response for {crit} criteria")
 
         # Parse the response in JSON to be able to fetch confidence and rationale
         parsed_response = safe_parse_json(llm_response)
@@ -56,19 +100,25 @@ class EvalPipeline:
         confidence = parsed_response.get("confidence")
         rationale = parsed_response.get("rationale")
         supporting_excerpts = parsed_response.get("supporting_excerpts")
-        log = f"Successful parsed LLM response for {crit} criteria"
-        logger.info(log), log_utils.log(log)
+        logger.info(f"Successful parsed LLM response for {crit} criteria")
+
+        return self.refine_category(crit, input_text, confidence, rationale, supporting_excerpts)
+
+    # Refine a first-pass assessment with RAG when its confidence is low
+    def refine_category(self, crit, input_text, confidence, rationale, supporting_excerpts):
+        category_question = self.tjson[crit]["question"]
+        category_description = self.tjson[crit]["description"]
 
         # If low confidence, trigger RAG
         if confidence < self.confidence_threshold * 100:
-            log = f"Low confidence ({confidence}) detected for {crit}. -----Invoking RAG-----..."
-            logger.warning(log), log_utils.log(log)
+            logger.warning(f"Low confidence ({confidence}) detected for {crit}. -----Invoking RAG-----...")
 
-            # Query similar cases from vector database
-            rag_cases = self.rag.summarize_similar_cases(input_text)
+            # Query similar cases from vector database, once per transcript
+            with self.metrics.span("rag_retrieval", crit):
+                rag_cases = self.similar_cases()
 
             # If no simular cases, return the initial LLM assessment and flag it
-            if rag_cases == "No similar past cases available.":
+            if rag_cases == NO_SIMILAR_CASES:
                 return {
                     "assessment": rationale,
                     "confidence": confidence,
@@ -76,15 +126,12 @@ class EvalPipeline:
                     "review_required": confidence < self.confidence_threshold * 100,
                     "rag_used": "Yes, but no similar past cases available.",
                 }
-            log = f"Similar cases for {crit} returned"
-            logger.warning(log), log_utils.log(log)
+            logger.warning(f"Similar cases for {crit} returned")
 
-            # Summarize similar cases to be able to be used in the prompt
-            summ_prompt = f""" Summarize {rag_cases} in few sentences so they can be used in another prompt for improving confidence 
-                """
-            rag_context = self.llm.run(summ_prompt)
-            log = f"Successful LLM summarize similar cases for {crit}"
-            logger.info(log), log_utils.log(log)
+            # Summarize similar cases to be able to be used in the prompt, once per transcript
+            with self.metrics.span("rag_summary", crit):
+                rag_context = self.summarized_similar_cases(rag_cases)
+            logger.info(f"Successful LLM summarize similar cases for {crit}")
 
             # Use the summarised cases together with the transcript to get better confidence
             refinement_prompt = f"""
@@ -97,22 +144,20 @@ class EvalPipeline:
                             "rationale": "...",
                             "supporting_excerpts": "...",
                 """
-            refined_llm_response = self.llm.run(refinement_prompt)
-            log = f"Successful refined LLM response for {crit}"
-            logger.info(log), log_utils.log(log)
+            with self.metrics.span("llm_refinement", crit):
+                refined_llm_response = self.llm.run(refinement_prompt)
+            logger.info(f"Successful refined LLM response for {crit}")
 
             # Parse the refined response in JSON to be able to fetch confidence and rationale
             parsed_refined_response = safe_parse_json(refined_llm_response)
-            log = f"Successful parsed the refined LLM response for {crit} criteria"
-            logger.info(log), log_utils.log(log)
+            logger.info(f"Successful parsed the refined LLM response for {crit} criteria")
 
             # Fetch the confidence, rationale and supporting_excerpts from the refined response
             refined_confidence = parsed_refined_response.get("confidence")
             refined_rationale = parsed_refined_response.get("rationale")
             refined_supporting_excerpts = parsed_refined_response.get("supporting_excerpts")
 
-            log = f"Confidence after RAG {refined_confidence}"
-            logger.info(log), log_utils.log(log)
+            logger.info(f"Confidence after RAG {refined_confidence}")
             # Return assessment including LLM response and response after using RAG
             return {
                 "LLM assessment": rationale,
@@ -127,8 +172,7 @@ class EvalPipeline:
                 "rag_used": "YES",
             }
 
-        log = f"Successful LLM response for {crit} with confidence {confidence}%"
-        logger.info(log), log_utils.log(log)
+        logger.info(f"Successful LLM response for {crit} with confidence {confidence}%")
 
         # Return the LLM response if the confidence is higher than 0.7
         return {
@@ -139,14 +183,208 @@ class EvalPipeline:
             "rag_used": "NO",
         }
 
-    def evaluate_transcript(self):
+    def similar_cases(self):
+        """Similar past cases for this transcript, retrieved once per pipeline run."""
+        return self._memoized(("similar_cases", self.rag_query_text),
+                              lambda: self.registry.rag.summarize_similar_cases(self.rag_query_text))
+
+    def summarized_similar_cases(self, rag_cases):
+        """LLM summary of the similar cases, made once per pipeline run."""
+        def summarize():
+            summ_prompt = f""" Summarize {rag_cases} in few sentences so they can be used in another prompt for improving confidence 
+                """
+            return self.llm.run(summ_prompt)
+        return self._memoized(("similar_cases_summary", rag_cases), summarize)
+
+    def _memoized(self, key, compute):
         """
-        Evaluate all categories for one transcript.
+        Return compute() memoized under key. Concurrent callers for the same key wait
+        for the first one instead of repeating the work.
+        """
+        with self._memo_lock:
+            future = self._memo.get(key)
+            owner = future is None
+            if owner:
+                future = self._memo[key] = Future()
+        if owner:
+            try:
+                future.set_result(compute())
+            except Exception as e:
+                future.set_exception(e)
+        return future.result()
+
+    # Evaluation for all categories with a single LLM call
+    def evaluate_batched(self, input_text):
         """
+        Ask for every criterion in one structured prompt and return the parsed per-criterion JSON.
+        Criteria missing from the response are left out so the caller can evaluate them one by one.
+        """
+        logger.info(f"Evaluating {len(self.criteria)} categories in a single LLM call")
+
+        criteria_block = "\n".join(
+            f'"{crit}": {self.tjson[crit]["question"]} {self.tjson[crit]["description"]}' for crit in self.criteria
+        )
+        batched_prompt = f"""
+            For the candidate, evaluate each of the following criteria based on transcript: {input_text}
+
+            Criteria:
+            {criteria_block}
+
+                                        Format the output as JSON using the following format excluding json word include proper curly brackets,
+                                        with one key per criterion, named exactly as in the list above, each holding:
+                                        "confidence": 0-100,
+                                        "rationale": "...",
+                                        "supporting_excerpts": "...",
+            """
+
+        with self.metrics.span("llm_batched"):
+            llm_response = self.llm.run(batched_prompt)
+        parsed_response = safe_parse_json(llm_response)
+        if not isinstance(parsed_response, dict):
+            # Valid JSON of another shape, e.g. a list of per-criterion objects
+            logger.warning("Batched LLM response is not a JSON object, falling back to single criterion calls")
+            return {}
+        logger.info("Successful parsed batched LLM response")
+
         results = {}
         for crit in self.criteria:
-            log = f"Evaluating category: ---------------{crit}---------------"
-            logger.info(log), log_utils.log(log)
-            excerpt = self.preproc_text  # Preprocessed text
-            results[crit] = self.evaluate_category(crit, excerpt)
-        return results
\ No newline at end of file
+            entry = parsed_response.get(crit)
+            if isinstance(entry, dict) and isinstance(entry.get("confidence"), (int, float)):
+                results[crit] = entry
+            else:
+                logger.warning(f"Batched LLM response has no usable result for {crit}, falling back to a single criterion call")
+        return results
+
+    def evaluate_transcript(self, on_result=None):
+        """
+        Evaluate all categories for one transcript.
+        on_result(crit, result), when given, is called as soon as each criterion is finished.
+        """
+        if self.speculative_rag:
+            self.prefetch_similar_cases()
+
+        if self.evaluation_mode == "batched":
+            excerpt, excerpts_used = self.select_excerpt(self._all_criteria_query(), self._batched_budget())
+            first_pass = self.evaluate_batched(excerpt)
+            report = self._run_per_criterion(
+                lambda crit: self._finish_batched(crit, first_pass.get(crit), excerpt, excerpts_used), on_result
+            )
+        else:
+            report = self._run_per_criterion(self._evaluate_one, on_result)
+
+        if self.speculative_rag:
+            with self._prefetch_lock:
+                self._criteria_done = True
+            self._count_prefetch_use(report)
+        return report
+
+    def prefetch_similar_cases(self):
+        """
+        Start the similar-case retrieval, and the case summary when prefetch_summary is set, in the
+        background. Both go through the per-run memo, so a low-confidence criterion picks up the
+        prefetched result, or waits for it, instead of starting the work after its first-pass call.
+        The summary LLM call is skipped when every criterion has finished before retrieval does.
+        """
+        def prefetch():
+            with self.metrics.span("rag_prefetch"):
+                rag_cases = self.similar_cases()
+                if not self.prefetch_summary or rag_cases == NO_SIMILAR_CASES:
+                    return
+                with self._prefetch_lock:
+                    if self._criteria_done:
+                        return
+                    self._summary_prefetched = True
+                self.summarized_similar_cases(rag_cases)
+
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rag-prefetch")
+        executor.submit(contextvars.copy_context().run, prefetch)
+        # Nobody waits for the prefetch, when every criterion is confident its result is simply dropped
+        executor.shutdown(wait=False)
+
+    def _count_prefetch_use(self, report):
+        used_cases = any(result.get("rag_used") != "NO" for result in report.values())
+        used_summary = any(result.get("rag_used") == "YES" for result in report.values())
+        self.metrics.count("rag_prefetch_hits" if used_cases else "rag_prefetch_waste")
+        # No summary is made when retrieval found nothing, so that is neither a hit nor waste
+        cases = self._memo.get(("similar_cases", self.rag_query_text))
+        no_cases = cases is not None and cases.done() and cases.exception() is None and cases.result() == NO_SIMILAR_CASES
+        if self.prefetch_summary and not no_cases:
+            if used_summary:
+                self.metrics.count("rag_summary_prefetch_hits")
+            elif self._summary_prefetched:
+                self.metrics.count("rag_summary_prefetch_waste")
+            else:
+                # The criteria finished first, so the prefetch skipped the summary call
+                self.metrics.count("rag_summary_prefetch_avoided")
+        logger.info(f"Speculative RAG prefetch {'used' if used_cases else 'discarded'}")
+
+    def select_excerpt(self, query, token_budget=None):
+        """
+        Return the prompt text for a query and the excerpts it was built from,
+        or the whole preprocessed transcript and None when excerpt selection is off.
+        """
+        if self.excerpt_selector is None:
+            return self.preproc_text, None
+        chunks = self.excerpt_selector.select(query, token_budget)
+        excerpts_used = [
+            {"turn": c["turn"], "speaker": c["speaker"], "score": c["score"], "tokens": c["tokens"], "text": c["text"]}
+            for c in chunks
+        ]
+        return ExcerptSelector.render(chunks), excerpts_used
+
+    def _criterion_query(self, crit):
+        return f"{self.tjson[crit]['question']} {self.tjson[crit]['description']}"
+
+    def _all_criteria_query(self):
+        return " ".join(self._criterion_query(crit) for crit in self.criteria)
+
+    def _batched_budget(self):
+        return self.batched_token_budget if self.excerpt_selector is not None else None
+
+    def _evaluate_one(self, crit):
+        logger.info(f"Evaluating category: ---------------{crit}---------------")
+        excerpt, excerpts_used = self.select_excerpt(self._criterion_query(crit))
+        if excerpts_used is not None:
+            logger.info(f"Selected {len(excerpts_used)} excerpts ({sum(e['tokens'] for e in excerpts_used)} tokens) for {crit}")
+        result = self.evaluate_category(crit, excerpt)
+        if excerpts_used is not None:
+            result["excerpts_used"] = excerpts_used
+        return result
+
+    def _finish_batched(self, crit, entry, excerpt, excerpts_used):
+        if entry is None:
+            return self._evaluate_one(crit)
+        # Only low-confidence criteria go through the RAG refinement path
+        result = self.refine_category(
+            crit, excerpt, entry["confidence"], entry.get("rationale"), entry.get("supporting_excerpts")
+        )
+        if excerpts_used is not None:
+            result["excerpts_used"] = excerpts_used
+        return result
+
+    def _run_per_criterion(self, evaluate, on_result=None):
+        """
+        Run evaluate(crit) for every criterion, in a thread pool of at most max_in_flight
+        when concurrent evaluation is enabled. on_result gets each result in completion order,
+        the returned results keep the criteria_list order.
+        """
+        results = {}
+        if not self.concurrent or self.max_in_flight <= 1:
+            for crit in self.criteria:
+                results[crit] = evaluate(crit)
+                if on_result is not None:
+                    on_result(crit, results[crit])
+            return results
+
+        logger.info(f"Evaluating {len(self.criteria)} categories concurrently (max in flight: {self.max_in_flight})")
+
+        with ThreadPoolExecutor(max_workers=min(self.max_in_flight, len(self.criteria))) as executor:
+            # Each task runs in a copy of the caller's context so its log lines reach the same request log
+            futures = {executor.submit(contextvars.copy_context().run, evaluate, crit): crit for crit in self.criteria}
+            for future in as_completed(futures):
+                crit = futures[future]
+                results[crit] = future.result()
+                if on_result is not None:
+                    on_result(crit, results[crit])
+        # Reorder so the report keeps the same layout as the sequential run
+        return {crit: results[crit] for crit in self.criteria}
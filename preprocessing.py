@@ -1,80 +1,179 @@
 import re
+import threading
+import functools
 import unicodedata
-from textblob import TextBlob
-import ftfy
+from collections import namedtuple
 import logging
-import log_utils
-from spellchecker import SpellChecker
 
 logger = logging.getLogger("preprocess")
 
+
+class SpellingCorrector:
+    """
+    Reusable spelling corrector. The SpellChecker frequency dictionary is loaded once
+    and corrections are memoized per unique token in a bounded LRU cache.
+    """
+
+    # Tokens that can't be misspellings: punctuation only, anything with a digit,
+    # speaker tags and anonymized names
+    SKIP_TOKEN = re.compile(r"^(?:[\W_]+|\S*\d\S*|(?:Candidate|Interviewer):?)$")
+
+    def __init__(self, language="en", cache_size=50000):
+        # Imported here so the spellchecker package loads with the dictionary, not at app start
+        from spellchecker import SpellChecker
+
+        self.spell = SpellChecker(language=language)
+        self.correct_token = functools.lru_cache(maxsize=cache_size)(self._correct_token)
+
+    def _correct_token(self, word):
+        if self.SKIP_TOKEN.match(word) or word.lower() in self.spell:
+            return word
+        corrected = self.spell.correction(word)
+        return corrected if corrected else word
+
+    def correct(self, text):
+        return ' '.join(self.correct_token(word) for word in text.split())
+
+
+_spelling_corrector = None
+_spelling_corrector_lock = threading.Lock()
+
+
+def get_spelling_corrector():
+    """Return the process-wide SpellingCorrector, loading the dictionary on first use."""
+    global _spelling_corrector
+    with _spelling_corrector_lock:
+        if _spelling_corrector is None:
+            _spelling_corrector = SpellingCorrector(language="en")
+        return _spelling_corrector
+
+
+# One speaker turn of a transcript, speaker is "Interviewer", "Candidate" or None for text before the first tag
+SpeakerTurn = namedtuple("SpeakerTurn", ["speaker", "text"])
+
+# Output of TranscriptNormalizer: flat text, speaker turns and how often each name appeared
+NormalizedTranscript = namedtuple(
+    "NormalizedTranscript", ["text", "turns", "candidate_mentions", "interviewer_mentions"]
+)
+
+
+def join_turns(turns):
+    """Flatten speaker turns back into the tagged transcript text."""
+    return ' '.join(f"{turn.speaker}: {turn.text}" if turn.speaker else turn.text for turn in turns if turn.text)
+
+
+class TranscriptNormalizer:
+    """
+    Single-pass transcript normalizer. One precompiled pattern finds the candidate and interviewer
+    names, speaker tags and whitespace, so names are counted and anonymized, whitespace is collapsed
+    and speaker turns are split in one traversal of the text.
+    """
+
+    # Speaker keywords are only treated as tags when followed by a colon or a dash, e.g. "Interviewer:".
+    # A name followed by a colon is a speaker label for that person.
+    INTERVIEWER_TAG = r"interview(?:er)?|question(?:er)?"
+    CANDIDATE_TAG = r"candidate|answer|respond(?:ent)?"
+    TAG_END = r"(?:[ \t]*:|-(?=\s))"
+
+    def __init__(self, candidate_name, interviewer_name):
+        self.pattern = re.compile(
+            rf"(?P<candidate_name>{self._name_pattern(candidate_name)}(?P<candidate_label>[ \t]*:)?)"
+            rf"|(?P<interviewer_name>{self._name_pattern(interviewer_name)}(?P<interviewer_label>[ \t]*:)?)"
+            rf"|(?P<interviewer_tag>\b(?i:{self.INTERVIEWER_TAG})\b{self.TAG_END})"
+            rf"|(?P<candidate_tag>\b(?i:{self.CANDIDATE_TAG})\b{self.TAG_END})"
+            r'|(?P<space_before_punct>\s+(?=[?.!,:;"]))'
+            r"|(?P<space>\s+)"
+        )
+
+    @staticmethod
+    def _name_pattern(name):
+        # Escaped name words, any whitespace between them (e.g. a line break inside a full name)
+        words = name.split()
+        if not words:
+            return r"(?!x)x"
+        return r"\b" + r"\s+".join(re.escape(word) for word in words) + r"\b"
+
+    def normalize(self, text):
+        counts = {"candidate_name": 0, "interviewer_name": 0}
+        turns = []
+        speaker = None
+        parts = []
+
+        def flush():
+            turn_text = ''.join(parts).strip()
+            if turn_text:
+                turns.append(SpeakerTurn(speaker, turn_text))
+            parts.clear()
+
+        position = 0
+        for match in self.pattern.finditer(text):
+            parts.append(text[position:match.start()])
+            position = match.end()
+            kind = match.lastgroup
+            if kind in counts:
+                counts[kind] += 1
+                if match.group(kind.replace("_name", "_label")):
+                    kind = kind.replace("_name", "_tag")
+                else:
+                    parts.append("Candidate" if kind == "candidate_name" else "Interviewer")
+            if kind == "interviewer_tag" or kind == "candidate_tag":
+                flush()
+                speaker = "Interviewer" if kind == "interviewer_tag" else "Candidate"
+            elif kind == "space":
+                parts.append(" ")
+        parts.append(text[position:])
+        flush()
+
+        return NormalizedTranscript(join_turns(turns), turns, counts["candidate_name"], counts["interviewer_name"])
+
+
 class Preproc:
     def __init__(self, text, candidate_name, interviewer_name):
         self.text = text
         self.candidate_name = candidate_name
         self.interviewer_name = interviewer_name
-
-    # Anonymize Candidate and Interviewer names
-    def anonymization(self, text):
-        text = re.sub(self.candidate_name, "Candidate", text)
-        text = re.sub(self.interviewer_name, "Interviewer", text)
-        return text
+        self.turns = None
+        self._normalized = None
 
     # Fix Unicode issues (accents, mojibake) using ftfy and unicodedata
     def normalize_unicode(self, text) -> str:
+        import ftfy
+
         text = ftfy.fix_text(text)
         text = unicodedata.normalize("NFC", text)
         return text
 
-    # Basic normalization: whitespace and punctuation
-    def clean_text_basic(self, text) -> str:
-        text = text.replace("\r", " ").replace("\n", " ")
-        text = re.sub(r'\s+', ' ', text)
-        text = re.sub(r'\s([?.!,:;"])', r'\1', text)
-        return text.strip()
+    # Validate names, anonymize, collapse whitespace and split speaker turns in a single pass
+    def normalize(self) -> NormalizedTranscript:
+        if self._normalized is None:
+            normalizer = TranscriptNormalizer(self.candidate_name, self.interviewer_name)
+            self._normalized = normalizer.normalize(self.normalize_unicode(self.text))
+        return self._normalized
 
     # Correct common grammar/spelling mistakes using TextBlob.
     def correct_text_with_textblob(self, text) -> str:
+        # Not part of the default pipeline, so TextBlob is only imported when this is used
+        from textblob import TextBlob
+
         corrected_sentences = []
         for sentence in re.split(r'(?<=[.!?])\s+', text):
             blob = TextBlob(sentence)
             corrected_sentences.append(str(blob.correct()))
         return ' '.join(corrected_sentences)
 
-    # Correct spelling using SpellChecker
+    # Correct spelling using the shared, memoized SpellChecker
     def correct_spelling(self, text):
-        spell = SpellChecker(language="en")
-        words = text.split()
-        corrected_words = []
-        for word in words:
-            if word.lower() in spell:
-                corrected_words.append(word)
-            else:
-                corrected = spell.correction(word)
-                corrected_words.append(corrected if corrected else word)
-        return ' '.join(corrected_words)
-
-    # Tag dialog segments
-    def tag_dialogue_segments(self, text) -> str:
-        # Normalize dialogue tags.
-        text = re.sub(r'(?i)\b(interview(er)?|question(er)?)\b[:\-]?', "Interviewer:", text)
-        text = re.sub(r'(?i)\b(candidate|answer|respond(ent)?)\b[:\-]?', "Candidate:", text)
-        text = re.sub(r'\s*([:.])', r'\1', text)
-        text = re.sub(r'(Interviewer:|Candidate:)\s*', lambda m: m.group(1) + " ", text)
-        return text
+        return get_spelling_corrector().correct(text)
 
-    # Full pipeline combining Unicode normalization, correction, and tagging.
+    # Full pipeline combining Unicode normalization, tagging, and correction.
+    # The speaker turns are kept in self.turns for stages that work per turn.
     def preprocess_transcript(self) -> str:
-        log = "Starting transcript preprocessing..."
-        logger.info(log), log_utils.log(log)
-
-        text = self.anonymization(self.text)
-        text = self.normalize_unicode(text)
-        text = self.clean_text_basic(text)
-        text = self.correct_spelling(text)
-      #  text = self.correct_text_with_textblob(text)
-        text = self.tag_dialogue_segments(text)
-
-        log = "Preprocessing complete."
-        logger.info(log),log_utils.log(log)
+        logger.info("Starting transcript preprocessing...")
+
+        normalized = self.normalize()
+        self.turns = [SpeakerTurn(turn.speaker, self.correct_spelling(turn.text)) for turn in normalized.turns]
+      #  self.turns = [SpeakerTurn(turn.speaker, self.correct_text_with_textblob(turn.text)) for turn in self.turns]
+        text = join_turns(self.turns)
+
+        logger.info("Preprocessing complete.")
         return text
\ No newline at end of file
@@ -1,4 +1,6 @@
 import os
+import json
+import hashlib
 import logging
 from llama_index.core import (
     SimpleDirectoryReader,
@@ -6,38 +8,43 @@ from llama_index.core import (
     StorageContext,
     load_index_from_storage
 )
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
 from llama_index.core import Settings
-from llama_index.core.query_engine import RetrieverQueryEngine
-from llama_index.llms.litellm import LiteLLM
 
 
 logger = logging.getLogger("rag_module")
 logging.basicConfig(level=logging.INFO)
 
 class RAGModule:
-    def __init__(self, config: dict):
+    def __init__(self, config: dict, embed_model=None):
 
         self.data_dir = config.get("data_dir")
         self.storage_dir = config.get("storage_dir")
         self.embed_model = config.get("embed_model")
-        self.llm_model = config.get("llm_model")
         self.rebuild_index = config.get("rebuild_index")
-        self.temperature = config.get("temperature", 0.5)
-
-
-        # Initialize models
-        api_key = os.getenv("OPENAI_API_KEY_HTEC")
-
-        Settings.embed_model = HuggingFaceEmbedding(model_name=self.embed_model)
-        Settings.llm = LiteLLM(
-            model=f"openai/{self.llm_model}",
-            api_key=api_key,
-            api_base="https://litellm.ai.paas.htec.rs",
-            temperature=self.temperature,
-        )
-
-        if self.rebuild_index or not os.path.exists(self.storage_dir):
+        self.incremental_index = config.get("incremental_index", False)
+        self.manifest_path = os.path.join(self.storage_dir, "ingest_manifest.json")
+        # "llama_index" (default StorageContext) or "mmap" (memory-mapped NumPy matrix, see vector_store.py)
+        self.backend = config.get("backend", "llama_index")
+        self.mmap_dtype = config.get("mmap_dtype", "float32")
+        self.index = None
+        self.vector_store = None
+        # Retrievers are built once per top_k and reused for every query
+        self._retrievers = {}
+
+        # Initialize the embedding model, retrieval only needs embeddings and no LLM
+        # Reuse an already loaded embedding model (e.g. from the resource registry) when given
+        if embed_model is None:
+            from embedding_backends import create_embed_model
+
+            embed_model = create_embed_model(config)
+        Settings.embed_model = embed_model
+
+        if self.backend == "mmap":
+            self._open_vector_store()
+        elif self.incremental_index:
+            logger.info("Updating RAG index incrementally from transcripts...")
+            self._update_index()
+        elif self.rebuild_index or not os.path.exists(self.storage_dir):
             logger.info("Building new RAG index from transcripts...")
             self._build_index()
         else:
@@ -48,14 +55,116 @@ class RAGModule:
         """
         Reads all transcripts from data_dir and builds a vector index.
         """
-        documents = SimpleDirectoryReader(input_dir=self.data_dir).load_data()
+        documents = SimpleDirectoryReader(input_dir=self.data_dir, filename_as_id=True).load_data()
         index = VectorStoreIndex.from_documents(documents)
 
         # Persist index
         index.storage_context.persist(persist_dir=self.storage_dir)
         self.index = index
+        self._write_manifest(self._hash_data_files(), documents)
         logger.info(f"RAG index built with {len(documents)} documents.")
 
+    def _update_index(self):
+        """
+        Embeds only new or changed transcripts in data_dir, drops deleted ones and persists the result.
+        Changes are detected with a content hash per file kept in the ingest manifest.
+        """
+        manifest = self._read_manifest()
+        if manifest is None or manifest.get("embed_model") != self.embed_model:
+            logger.info("No usable ingest manifest found, building the RAG index from scratch.")
+            self._build_index()
+            return
+
+        self._load_index()
+        ingested = manifest["files"]
+        current = self._hash_data_files()
+
+        changed = [f for f, h in current.items() if f not in ingested or ingested[f]["hash"] != h]
+        removed = [f for f in ingested if f not in current]
+        if not changed and not removed:
+            logger.info("RAG index is up to date.")
+            return
+
+        # Drop the old documents of changed and deleted files
+        for file_name in changed + removed:
+            for doc_id in ingested.get(file_name, {}).get("doc_ids", []):
+                self.index.delete_ref_doc(doc_id, delete_from_docstore=True)
+            ingested.pop(file_name, None)
+
+        # Embed only the new and changed files
+        for file_name in changed:
+            documents = SimpleDirectoryReader(
+                input_files=[os.path.join(self.data_dir, file_name)], filename_as_id=True
+            ).load_data()
+            for document in documents:
+                self.index.insert(document)
+            ingested[file_name] = {"hash": current[file_name], "doc_ids": [d.doc_id for d in documents]}
+
+        self.index.storage_context.persist(persist_dir=self.storage_dir)
+        self._save_manifest(ingested)
+        logger.info(f"RAG index updated: {len(changed)} files embedded, {len(removed)} files removed.")
+
+    def _hash_data_files(self):
+        """
+        Content hash for every transcript file SimpleDirectoryReader would pick up from data_dir.
+        """
+        hashes = {}
+        for file_name in sorted(os.listdir(self.data_dir)):
+            path = os.path.join(self.data_dir, file_name)
+            if file_name.startswith(".") or not os.path.isfile(path):
+                continue
+            digest = hashlib.sha256()
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+            hashes[file_name] = digest.hexdigest()
+        return hashes
+
+    def _read_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return None
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Ignoring unreadable ingest manifest: {e}")
+            return None
+
+    def _write_manifest(self, hashes, documents):
+        files = {file_name: {"hash": h, "doc_ids": []} for file_name, h in hashes.items()}
+        for document in documents:
+            file_name = document.metadata.get("file_name")
+            if file_name in files:
+                files[file_name]["doc_ids"].append(document.doc_id)
+        self._save_manifest(files)
+
+    def _save_manifest(self, files):
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"embed_model": self.embed_model, "files": files}, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _open_vector_store(self):
+        """
+        Open the memory-mapped vector store, syncing it with data_dir first when the index
+        should be rebuilt or updated. Unchanged files keep their embeddings unless rebuild_index is set.
+        """
+        from vector_store import MmapVectorStore
+
+        self.vector_store = MmapVectorStore(os.path.join(self.storage_dir, "mmap"), dtype=self.mmap_dtype)
+        if self.rebuild_index or self.incremental_index or not self.vector_store.exists():
+            logger.info("Syncing memory-mapped vector store with transcripts...")
+            self.vector_store.sync(
+                self.data_dir,
+                self._hash_data_files(),
+                Settings.embed_model,
+                self.embed_model,
+                rebuild=bool(self.rebuild_index) and not self.incremental_index,
+            )
+        else:
+            logger.info("Loading memory-mapped vector store...")
+            self.vector_store.load()
+
     def _load_index(self):
         storage_context = StorageContext.from_defaults(persist_dir=self.storage_dir)
         self.index = load_index_from_storage(storage_context)
@@ -64,21 +173,26 @@ class RAGModule:
     def query_similar_cases(self, text: str, top_k: int = 2, similarity_threshold: float = 0.7):
         """
         Query the vector index for similar interview transcripts.
+        Pure retrieval: the query is embedded once and the scored nodes are returned, no LLM synthesis.
         """
-        retriever = self.index.as_retriever(similarity_top_k=top_k)
-        query_engine = RetrieverQueryEngine(retriever=retriever)
+        if self.vector_store is not None:
+            query_embedding = Settings.embed_model.get_query_embedding(text)
+            hits = [(sim, node["text"]) for sim, node in self.vector_store.query(query_embedding, top_k)]
+        else:
+            retriever = self._retrievers.get(top_k)
+            if retriever is None:
+                retriever = self._retrievers[top_k] = self.index.as_retriever(similarity_top_k=top_k)
+            hits = [(node.score if node.score is not None else 0.0, node.node.text) for node in retriever.retrieve(text)]
 
-        response = query_engine.query(text)
-        if not response or not response.response:
+        if not hits:
             logger.warning("No relevant similar cases found.")
             return []
 
         results = []
-        for node in response.source_nodes:
-            sim = node.score if hasattr(node, "score") else 0.0
+        for sim, node_text in hits:
             if sim >= similarity_threshold:
                 results.append({
-                    "text": node.node.text[:500],  # partial snippet
+                    "text": node_text[:500],  # partial snippet
                     "similarity": round(sim, 3)
                 })
 
@@ -0,0 +1,63 @@
+import time
+import threading
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled at per_minute / 60 per second, holding at most per_minute.
+    reserve() takes the amount right away and returns how long the caller must wait before using it,
+    the balance may go negative, so callers are served in the order they reserved.
+    """
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount=1):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def consume(self, amount):
+        """Charge (or, when negative, refund) tokens after the fact, without waiting."""
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class RateLimiter:
+    """
+    Requests per minute and tokens per minute limits for one process. A limit of 0 or None is unlimited.
+    reserve() returns the wait before a request with the estimated token count may be sent,
+    settle() corrects the token bucket once the actual usage is known.
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.requests_per_minute = requests_per_minute or None
+        self.tokens_per_minute = tokens_per_minute or None
+        self.requests = TokenBucket(self.requests_per_minute) if self.requests_per_minute else None
+        self.tokens = TokenBucket(self.tokens_per_minute) if self.tokens_per_minute else None
+
+    def reserve(self, estimated_tokens):
+        wait = 0.0
+        if self.requests is not None:
+            wait = max(wait, self.requests.reserve(1))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.reserve(estimated_tokens))
+        return wait
+
+    def settle(self, estimated_tokens, actual_tokens):
+        if self.tokens is not None and actual_tokens:
+            self.tokens.consume(actual_tokens - estimated_tokens)
+
+    def split(self, parts):
+        """A limiter with 1/parts of these limits, e.g. for each of several worker processes."""
+        return RateLimiter(
+            self.requests_per_minute / parts if self.requests_per_minute else None,
+            self.tokens_per_minute / parts if self.tokens_per_minute else None,
+        )
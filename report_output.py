@@ -1,40 +1,72 @@
 import json
-import yaml
-from datetime import datetime
+import copy
 import logging
+from contextlib import nullcontext
+from resources import get_registry
 
 logger = logging.getLogger("Report_Output")
 
 class Export:
-    def __init__(self, report, candidate_id, json_temp_path="./config/template.json", config_path="./config/config.yaml"):
-    # Open configuration file and fetch values
-        with open(json_temp_path) as t:
-            self.temp_json = json.load(t)
-        with open(config_path) as c:
-            config = yaml.safe_load(c)
-            self.criteria = config["pipeline"]["criteria_list"]
+    def __init__(self, report, candidate_id, json_temp_path="./config/template.json", config_path="./config/config.yaml", registry=None, metrics=None, request_id=None):
+    # Fetch the shared template, configuration values and report store, the template is copied because it gets filled in
+        registry = registry or get_registry(config_path, json_temp_path)
+        self.temp_json = copy.deepcopy(registry.template)
+        self.criteria = registry.config["pipeline"]["criteria_list"]
+        self.store = registry.report_store
         self.report = report
         self.candidate_id = candidate_id
-        self.timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        # Set once the report is in the store, given when exporting a report that is already stored
+        self.request_id = request_id
+        # Optional RunMetrics of the evaluation, the export is timed in it and it is added to the full report
+        self.metrics = metrics
+        # Metrics read back from the store, used when the run's RunMetrics are not at hand
+        self.stored_metrics = None
 
+    @classmethod
+    def from_store(cls, request_id, registry=None):
+        """Export for a report already in the store, e.g. to regenerate its download files."""
+        registry = registry or get_registry()
+        record = registry.report_store.get(request_id)
+        if record is None:
+            raise KeyError(f"No stored report with request ID {request_id}")
+        export = cls(record["report"], record["candidate"], registry=registry, request_id=request_id)
+        export.stored_metrics = record.get("metrics")
+        return export
 
-    def json_report(self):
-        for crit in self.criteria:
-            # Fetch the question and description for a category from the json template file
-            self.temp_json[crit]["initial_assessment"] = self.report[crit]["assessment"]
-
-        json_report_path=f"./reports/JSON report for {self.candidate_id}_req_ID_{self.timestamp}.json"
+    def save(self):
+        """Append the report, with its metrics, to the report store once and return its request ID."""
+        if self.request_id is None:
+            with self._span():
+                metrics = self.metrics.to_dict() if self.metrics is not None else None
+                self.request_id = self.store.append(self.candidate_id, self.report, metrics)
+        return self.request_id
 
-        with open(json_report_path, "w") as e:
-            json.dump(self.temp_json, e, indent=4)
+    # The downloadable files are written only when asked for, the store always holds the report
+    def json_report(self):
+        self.save()
+        with self._span():
+            for crit in self.criteria:
+                # Fetch the question and description for a category from the json template file
+                self.temp_json[crit]["initial_assessment"] = self.report[crit]["assessment"]
 
+            json_report_path = f"./reports/JSON report for {self.candidate_id}_req_ID_{self.request_id}.json"
+            with open(json_report_path, "w") as e:
+                json.dump(self.temp_json, e, indent=4)
         return json_report_path
 
     def full_report(self):
-        full_report_path = f"./full_reports/Full_Report for {self.candidate_id}_req_ID_{self.timestamp}.json"
-        with open(full_report_path, "w") as e:
-            json.dump(self.report, e, indent=4)
-        return full_report_path
-
+        self.save()
+        with self._span():
+            full_report = self.report
+            metrics = self.metrics.to_dict() if self.metrics is not None else self.stored_metrics
+            if metrics is not None:
+                # Holds the spans finished so far, i.e. everything but this last write
+                full_report = {**self.report, "metrics": metrics}
 
+            full_report_path = f"./full_reports/Full_Report for {self.candidate_id}_req_ID_{self.request_id}.json"
+            with open(full_report_path, "w") as e:
+                json.dump(full_report, e, indent=4)
+        return full_report_path
 
+    def _span(self):
+        return self.metrics.span("export") if self.metrics is not None else nullcontext()
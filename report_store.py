@@ -0,0 +1,158 @@
+import os
+import re
+import json
+import time
+import uuid
+import sqlite3
+import threading
+import logging
+from datetime import datetime
+
+logger = logging.getLogger("report_store")
+
+SEGMENT_NAME = re.compile(r"^segment-(\d{6})\.jsonl$")
+
+
+class ReportStore:
+    """
+    Append-only store of evaluation reports.
+    Each report is one compact JSON line appended to the current segment file, segments roll over
+    at segment_max_bytes. A SQLite index maps request ID to segment, offset and length, and is
+    indexed by candidate and time, so lookups never scan directories or parse other reports.
+    Appends use O_APPEND writes, so several processes can share one store.
+    """
+
+    def __init__(self, store_dir, segment_max_bytes=64 * 1024 * 1024):
+        self.store_dir = store_dir
+        self.segment_max_bytes = segment_max_bytes
+        self._lock = threading.Lock()
+
+        os.makedirs(store_dir, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(store_dir, "index.sqlite"), check_same_thread=False, timeout=30)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS reports ("
+            "request_id TEXT PRIMARY KEY, candidate TEXT NOT NULL, created REAL NOT NULL, "
+            "segment INTEGER NOT NULL, offset INTEGER NOT NULL, length INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS reports_candidate ON reports (candidate, created)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS reports_created ON reports (created)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS reports_segment ON reports (segment, offset)")
+        self._conn.commit()
+        self._recover()
+
+    @staticmethod
+    def new_request_id():
+        """Sortable, unique request ID: second-resolution timestamp plus a random suffix."""
+        return f"{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}_{uuid.uuid4().hex[:8]}"
+
+    def append(self, candidate, report, metrics=None, request_id=None):
+        """Append one report and return its request ID."""
+        request_id = request_id or self.new_request_id()
+        record = {"request_id": request_id, "candidate": candidate, "created": time.time(), "report": report}
+        if metrics is not None:
+            record["metrics"] = metrics
+        data = (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+        with self._lock:
+            segment = self._current_segment()
+            fd = os.open(self._segment_path(segment), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, data)
+                # With O_APPEND the position after the write is the end of our own record
+                offset = os.lseek(fd, 0, os.SEEK_CUR) - len(data)
+            finally:
+                os.close(fd)
+            self._index(record, segment, offset, len(data))
+            self._conn.commit()
+        return request_id
+
+    def get(self, request_id):
+        """The stored record for a request ID, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT segment, offset, length FROM reports WHERE request_id = ?", (request_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        segment, offset, length = row
+        with open(self._segment_path(segment), "rb") as f:
+            f.seek(offset)
+            return json.loads(f.read(length))
+
+    def find(self, candidate=None, since=None, until=None, limit=None):
+        """Index entries, newest first, optionally filtered by candidate and a created time range (epoch seconds)."""
+        query = "SELECT request_id, candidate, created FROM reports WHERE 1 = 1"
+        params = []
+        if candidate is not None:
+            query += " AND candidate = ?"
+            params.append(candidate)
+        if since is not None:
+            query += " AND created >= ?"
+            params.append(since)
+        if until is not None:
+            query += " AND created < ?"
+            params.append(until)
+        query += " ORDER BY created DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [{"request_id": r[0], "candidate": r[1], "created": r[2]} for r in rows]
+
+    def latest(self, candidate):
+        entries = self.find(candidate=candidate, limit=1)
+        return self.get(entries[0]["request_id"]) if entries else None
+
+    def rebuild_index(self):
+        """Drop the index and rebuild it from the segment files."""
+        with self._lock:
+            self._conn.execute("DELETE FROM reports")
+            self._conn.commit()
+        self._recover()
+
+    def _segment_path(self, segment):
+        return os.path.join(self.store_dir, f"segment-{segment:06d}.jsonl")
+
+    def _segments(self):
+        return sorted(int(m.group(1)) for m in map(SEGMENT_NAME.match, os.listdir(self.store_dir)) if m)
+
+    def _current_segment(self):
+        # The index is shared by every process appending to the store, so it knows the latest
+        # segment without a directory scan, only that segment's size is checked
+        last = self._conn.execute("SELECT MAX(segment) FROM reports").fetchone()[0] or 1
+        try:
+            size = os.path.getsize(self._segment_path(last))
+        except FileNotFoundError:
+            return last
+        return last + 1 if size >= self.segment_max_bytes else last
+
+    def _index(self, record, segment, offset, length):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO reports (request_id, candidate, created, segment, offset, length) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (record["request_id"], record["candidate"], record["created"], segment, offset, length),
+        )
+
+    def _recover(self):
+        """Index records appended after the last indexed one of each segment, e.g. after a crash."""
+        with self._lock:
+            recovered = 0
+            for segment in self._segments():
+                end = self._conn.execute(
+                    "SELECT MAX(offset + length) FROM reports WHERE segment = ?", (segment,)
+                ).fetchone()[0] or 0
+                with open(self._segment_path(segment), "rb") as f:
+                    f.seek(end)
+                    offset = end
+                    for line in f:
+                        if line.endswith(b"\n"):
+                            try:
+                                self._index(json.loads(line), segment, offset, len(line))
+                                recovered += 1
+                            except (json.JSONDecodeError, KeyError):
+                                logger.warning(f"Skipping unreadable record at {segment}:{offset}")
+                        offset += len(line)
+            self._conn.commit()
+        if recovered:
+            logger.info(f"Report store index recovered {recovered} records")
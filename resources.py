@@ -0,0 +1,151 @@
+import json
+import threading
+import logging
+import yaml
+from llm_client import LLMClient
+from metrics import MetricsAggregator
+from report_store import ReportStore
+
+logger = logging.getLogger("resources")
+
+
+class ResourceRegistry:
+    """
+    Process-wide holder for the configuration, JSON template, LLM client, embedding model, RAG index,
+    metrics aggregator and report store. Everything is loaded on first use and shared by every EvalPipeline and
+    Export in the process.
+    """
+
+    def __init__(self, config_path="./config/config.yaml", template_path="./config/template.json"):
+        self.config_path = config_path
+        self.template_path = template_path
+        self._lock = threading.RLock()
+        # Separate lock for the embedding model and RAG index, so requests reading the config
+        # are not held up while a background warm-up builds the index
+        self._model_lock = threading.RLock()
+        self._config = None
+        self._template = None
+        self._llm = None
+        self._embed_model = None
+        self._embed_model_key = None
+        self._rag = None
+        self._metrics = None
+        self._report_store = None
+
+    @property
+    def config(self):
+        with self._lock:
+            if self._config is None:
+                with open(self.config_path) as f:
+                    self._config = yaml.safe_load(f)
+            return self._config
+
+    @property
+    def template(self):
+        # Callers that fill in the template must deep copy it first
+        with self._lock:
+            if self._template is None:
+                with open(self.template_path) as t:
+                    self._template = json.load(t)
+            return self._template
+
+    @property
+    def llm(self):
+        with self._lock:
+            if self._llm is None:
+                self._llm = LLMClient(self.config["llm"])
+            return self._llm
+
+    @property
+    def embed_model(self):
+        with self._model_lock:
+            rag_config = self.config["rag"]
+            model_key = (rag_config.get("embed_model"), rag_config.get("embed_backend", "huggingface"))
+            if self._embed_model is None or self._embed_model_key != model_key:
+                logger.info(f"Loading embedding model {model_key[0]} ({model_key[1]} backend)")
+                from embedding_backends import create_embed_model
+
+                self._embed_model = create_embed_model(rag_config)
+                self._embed_model_key = model_key
+            return self._embed_model
+
+    @property
+    def rag(self):
+        with self._model_lock:
+            if self._rag is None:
+                from rag_module import RAGModule
+
+                self._rag = RAGModule(self.config["rag"], embed_model=self.embed_model)
+            return self._rag
+
+    @property
+    def metrics(self):
+        with self._lock:
+            if self._metrics is None:
+                self._metrics = MetricsAggregator(self.config.get("metrics"))
+            return self._metrics
+
+    @property
+    def report_store(self):
+        with self._lock:
+            if self._report_store is None:
+                store_config = self.config.get("reports") or {}
+                self._report_store = ReportStore(
+                    store_config.get("store_dir", "./data/report_store"),
+                    segment_max_bytes=store_config.get("segment_max_mb", 64) * 1024 * 1024,
+                )
+            return self._report_store
+
+    def warm_up(self, connections=True):
+        """
+        Load every resource up front so the first request does not pay for it.
+        Cheap resources come first, so a warm-up running in the background makes them
+        available to requests before the embedding model and RAG index are ready.
+        With connections=False the LLM client and report store are left out, e.g. before forking
+        workers, since HTTP pools and SQLite connections must not be shared across fork().
+        """
+        from preprocessing import get_spelling_corrector
+
+        self.config, self.template
+        if connections:
+            self.llm, self.report_store
+        get_spelling_corrector()
+        self.rag
+        logger.info("Resource registry warmed up")
+
+    def after_fork(self):
+        """
+        Make a forked child's registry safe to use: new locks, since another parent thread may have
+        held them at fork time, and no LLM client or report store inherited from the parent.
+        """
+        self._lock = threading.RLock()
+        self._model_lock = threading.RLock()
+        self._llm = None
+        self._report_store = None
+
+    def reload(self):
+        """
+        Drop the cached configuration, template, LLM client, RAG index, metrics totals and report store
+        so they are rebuilt from disk on next use. The embedding model is kept unless config names a different model or backend.
+        """
+        with self._model_lock, self._lock:
+            self._config = None
+            self._template = None
+            self._llm = None
+            self._rag = None
+            self._metrics = None
+            self._report_store = None
+        logger.info("Resource registry reloaded")
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def get_registry(config_path="./config/config.yaml", template_path="./config/template.json"):
+    """Return the shared registry for the given config and template paths."""
+    key = (config_path, template_path)
+    with _registries_lock:
+        if key not in _registries:
+            _registries[key] = ResourceRegistry(config_path, template_path)
+        return _registries[key]
@@ -0,0 +1,124 @@
+"""
+Multi-process serving for the Gradio app.
+
+WorkerPool forks N worker processes after the parent has loaded the embedding model, the RAG
+index and the spelling dictionary, so the workers share those pages copy-on-write instead of each
+loading its own copy (with rag.backend: mmap the index is shared through the page cache anyway).
+Each worker runs up to `concurrency` requests at a time in threads and only takes a new request
+from the shared queue when it has a free slot, so requests go to the least busy worker.
+
+A request is handler(emit, *args) running in a worker. Every emit(kind, payload) call is sent
+back to the parent and put on the events queue the request was submitted with, as (kind, payload).
+"""
+import gc
+import os
+import queue
+import logging
+import itertools
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger("serving")
+
+# Sent by a worker right before it exits, not passed on to any request
+_WORKER_EXIT = "__worker_exit__"
+
+
+def _worker_main(handler, tasks, results, concurrency, initializer, initargs):
+    if initializer is not None:
+        initializer(*initargs)
+    slots = threading.Semaphore(concurrency)
+
+    def run(request_id, args):
+        try:
+            handler(lambda kind, payload: results.put((request_id, kind, payload)), *args)
+        except Exception as e:
+            logger.exception(f"Worker request {request_id} failed: {e}")
+        finally:
+            slots.release()
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="eval") as executor:
+        while True:
+            slots.acquire()
+            task = tasks.get()
+            if task is None:
+                break
+            executor.submit(run, *task)
+    results.put((None, _WORKER_EXIT, os.getpid()))
+
+
+class WorkerPool:
+    """Forked evaluation workers with a dispatcher thread routing their events back to the requests."""
+
+    def __init__(self, handler, workers=2, concurrency=2, initializer=None, initargs=()):
+        self.handler = handler
+        # Called in each worker right after the fork, before it takes any request
+        self.initializer = initializer
+        self.initargs = initargs
+        self.workers = workers
+        self.concurrency = concurrency
+        self.processes = []
+        self._pending = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._tasks = None
+        self._results = None
+
+    def start(self):
+        """
+        Fork the workers. Call it after everything to be shared is loaded and, preferably,
+        before the UI starts its threads.
+        """
+        context = multiprocessing.get_context("fork")
+        self._tasks = context.Queue()
+        self._results = context.Queue()
+        # Tokenizers already used in the parent would otherwise warn and disable themselves in every worker
+        os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+        # Objects that exist now are never scanned by the collector again, so it does not dirty their shared pages
+        gc.freeze()
+        for i in range(self.workers):
+            process = context.Process(
+                target=_worker_main, args=(self.handler, self._tasks, self._results, self.concurrency, self.initializer, self.initargs),
+                name=f"eval-worker-{i}", daemon=True,
+            )
+            process.start()
+            self.processes.append(process)
+        gc.unfreeze()
+        threading.Thread(target=self._dispatch, name="worker-dispatch", daemon=True).start()
+        logger.info(f"Started {self.workers} evaluation workers with {self.concurrency} requests each")
+        return self
+
+    def submit(self, events, *args):
+        """Run handler(emit, *args) in a worker, its events are put on the events queue."""
+        request_id = next(self._ids)
+        with self._lock:
+            self._pending[request_id] = events
+        self._tasks.put((request_id, args))
+        return request_id
+
+    def shutdown(self):
+        """Let the workers finish the requests they are running and exit."""
+        for _ in self.processes:
+            self._tasks.put(None)
+
+    def alive(self):
+        return sum(process.is_alive() for process in self.processes)
+
+    def _dispatch(self):
+        running = len(self.processes)
+        while running:
+            try:
+                request_id, kind, payload = self._results.get(timeout=5)
+            except queue.Empty:
+                if not self.alive():
+                    logger.error("All evaluation workers have exited")
+                    return
+                continue
+            if kind == _WORKER_EXIT:
+                running -= 1
+                continue
+            with self._lock:
+                events = self._pending.pop(request_id) if kind == "done" else self._pending.get(request_id)
+            if events is not None:
+                events.put((kind, payload))
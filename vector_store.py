@@ -0,0 +1,156 @@
+import os
+import json
+import mmap
+import logging
+import numpy as np
+from llama_index.core import SimpleDirectoryReader, Settings
+
+logger = logging.getLogger("vector_store")
+
+
+class MmapVectorStore:
+    """
+    Local vector store for the RAG module. Embeddings live in one contiguous, L2-normalized
+    float32 (or float16) matrix file that is opened with mmap, node text and metadata live in a
+    JSONL file addressed through an int64 offset index. Loading only maps the files, so start-up
+    time and resident memory stay flat as the corpus grows, and top-k cosine search is a
+    vectorized matrix product.
+
+    Files in storage_dir:
+        meta.json    dim, count, dtype, embedding model and the rows of every source file
+        vectors.bin  count x dim embedding matrix
+        nodes.jsonl  one {"text", "metadata"} record per row
+        nodes.idx    count + 1 byte offsets into nodes.jsonl
+    """
+
+    # Rows scored per block, bounds the temporary float32 copy when the matrix is float16
+    SEARCH_BLOCK_ROWS = 65536
+
+    def __init__(self, storage_dir, dtype="float32"):
+        self.storage_dir = storage_dir
+        self.dtype = np.dtype(dtype)
+        self.meta = None
+        self.vectors = None
+        self.offsets = None
+        self._nodes = None
+
+    def _path(self, name):
+        return os.path.join(self.storage_dir, name)
+
+    def exists(self):
+        return os.path.exists(self._path("meta.json"))
+
+    def load(self):
+        with open(self._path("meta.json")) as f:
+            self.meta = json.load(f)
+        count, dim = self.meta["count"], self.meta["dim"]
+        if count == 0:
+            self.vectors = np.zeros((0, dim), dtype=self.meta["dtype"])
+            self.offsets = np.zeros(1, dtype=np.int64)
+            self._nodes = b""
+        else:
+            self.vectors = np.memmap(self._path("vectors.bin"), dtype=self.meta["dtype"], mode="r", shape=(count, dim))
+            self.offsets = np.memmap(self._path("nodes.idx"), dtype=np.int64, mode="r", shape=(count + 1,))
+            with open(self._path("nodes.jsonl"), "rb") as f:
+                self._nodes = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        logger.info(f"Memory-mapped vector store loaded with {count} nodes.")
+
+    def sync(self, data_dir, file_hashes, embed_model, embed_model_name, rebuild=False):
+        """
+        Bring the store in line with data_dir. Rows of files whose content hash is unchanged are
+        copied from the current matrix, only new or changed files are split and embedded.
+        """
+        previous = None
+        if not rebuild and self.exists():
+            self.load()
+            if self.meta.get("embed_model") == embed_model_name and self.meta.get("dtype") == self.dtype.name:
+                previous = self.meta
+
+        old_files = previous["files"] if previous else {}
+        if previous and set(old_files) == set(file_hashes) and all(
+            old_files[f]["hash"] == h for f, h in file_hashes.items()
+        ):
+            logger.info("Memory-mapped vector store is up to date.")
+            return
+
+        os.makedirs(self.storage_dir, exist_ok=True)
+        tmp = {name: self._path(name + ".tmp") for name in ("vectors.bin", "nodes.jsonl", "nodes.idx", "meta.json")}
+        files = {}
+        offsets = [0]
+        count = 0
+        dim = previous["dim"] if previous else None
+        embedded = 0
+
+        with open(tmp["vectors.bin"], "wb") as vectors_out, open(tmp["nodes.jsonl"], "wb") as nodes_out:
+            for file_name, file_hash in file_hashes.items():
+                old = old_files.get(file_name)
+                if old and old["hash"] == file_hash:
+                    start, end = old["rows"]
+                    vectors = np.asarray(self.vectors[start:end])
+                    records = [self._node_bytes(row) for row in range(start, end)]
+                else:
+                    documents = SimpleDirectoryReader(input_files=[os.path.join(data_dir, file_name)]).load_data()
+                    nodes = Settings.node_parser.get_nodes_from_documents(documents)
+                    texts = [node.get_content() for node in nodes]
+                    vectors = self._normalize(np.asarray(embed_model.get_text_embedding_batch(texts), dtype=np.float32))
+                    records = [
+                        json.dumps({"text": node.get_content(), "metadata": node.metadata}, ensure_ascii=False).encode("utf-8") + b"\n"
+                        for node in nodes
+                    ]
+                    embedded += len(nodes)
+
+                if len(records):
+                    dim = dim or vectors.shape[1]
+                    vectors_out.write(np.ascontiguousarray(vectors, dtype=self.dtype).tobytes())
+                    for record in records:
+                        nodes_out.write(record)
+                        offsets.append(offsets[-1] + len(record))
+                files[file_name] = {"hash": file_hash, "rows": [count, count + len(records)]}
+                count += len(records)
+
+        np.asarray(offsets, dtype=np.int64).tofile(tmp["nodes.idx"])
+        meta = {"dim": dim or 0, "count": count, "dtype": self.dtype.name, "embed_model": embed_model_name, "files": files}
+        with open(tmp["meta.json"], "w") as f:
+            json.dump(meta, f, indent=2)
+
+        # Release the old mappings before swapping the files in, meta.json goes last
+        self.close()
+        for name in ("vectors.bin", "nodes.jsonl", "nodes.idx", "meta.json"):
+            os.replace(tmp[name], self._path(name))
+        self.load()
+        logger.info(f"Memory-mapped vector store synced: {embedded} nodes embedded, {count - embedded} reused.")
+
+    def close(self):
+        if isinstance(self._nodes, mmap.mmap):
+            self._nodes.close()
+        self.vectors = self.offsets = self._nodes = None
+
+    @staticmethod
+    def _normalize(vectors):
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def _node_bytes(self, row):
+        return self._nodes[int(self.offsets[row]):int(self.offsets[row + 1])]
+
+    def node(self, row):
+        return json.loads(self._node_bytes(row))
+
+    def query(self, query_embedding, top_k=2):
+        """
+        Top-k cosine search. Returns [(similarity, node dict)] sorted by similarity.
+        """
+        count = len(self.vectors)
+        if count == 0:
+            return []
+        query = self._normalize(np.asarray(query_embedding, dtype=np.float32)[None, :])[0]
+
+        scores = np.empty(count, dtype=np.float32)
+        for start in range(0, count, self.SEARCH_BLOCK_ROWS):
+            block = self.vectors[start:start + self.SEARCH_BLOCK_ROWS]
+            scores[start:start + len(block)] = block.astype(np.float32, copy=False) @ query
+
+        k = min(top_k, count)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[row]), self.node(int(row))) for row in top]